@@ -0,0 +1,220 @@
+# analytics.py
+# Term-wide grade reports. Every graded enrollment is loaded once as flat
+# NumPy arrays (course id, student id, grade) and each statistic is a
+# grouped reduction over them -- sorted per-course segments with
+# np.add.reduceat, np.bincount for per-student and per-teacher sums -- so
+# nothing runs per row in Python. NumPy is optional; app.py imports this
+# module only when a report is asked for.
+import time
+from itertools import chain
+
+import numpy as np
+
+from models import db, Course, Enrollment
+
+PERCENTILES = (10, 25, 50, 75, 90)
+FETCH_ROWS = 50_000
+
+_GRADED = (
+    db.select(Enrollment.course_id, Enrollment.student_id, Enrollment.grade)
+    .where(Enrollment.grade.is_not(None))
+)
+
+
+def load_grades():
+    """(course_ids, student_ids, grades) of every graded enrollment.
+
+    Reads through a plain DB-API cursor so no Row object is built per
+    enrollment; each batch of tuples is flattened straight into an array.
+    """
+    conn = db.session.connection()
+    sql = str(_GRADED.compile(dialect=conn.dialect))
+    cursor = conn.connection.cursor()
+    chunks = []
+    try:
+        cursor.execute(sql)
+        while rows := cursor.fetchmany(FETCH_ROWS):
+            chunks.append(np.fromiter(chain.from_iterable(rows),
+                                      dtype=np.float64, count=3 * len(rows)))
+    finally:
+        cursor.close()
+    data = np.concatenate(chunks).reshape(-1, 3) if chunks \
+        else np.empty((0, 3))
+    return (data[:, 0].astype(np.int64), data[:, 1].astype(np.int64),
+            data[:, 2].copy())
+
+
+def load_teachers():
+    # (course ids sorted, teacher id of each)
+    rows = db.session.execute(
+        db.select(Course.id, Course.teacher_id).order_by(Course.id)
+    ).all()
+    arr = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    return arr[:, 0], arr[:, 1]
+
+
+def dense_index(ids):
+    """(distinct ids in order, position of each id among them).
+
+    Like np.unique(ids, return_inverse=True) but through a lookup table
+    instead of a sort; ids are primary keys, so the table stays small.
+    """
+    present = np.bincount(ids) > 0 if len(ids) else np.zeros(0, bool)
+    lookup = np.cumsum(present) - 1
+    return np.flatnonzero(present), lookup[ids]
+
+
+class Term:
+    """The graded enrollments as arrays, with the indexes every report
+    section groups by: `course` and `student` are positions into
+    `course_ids` / `student_ids`, and `teacher_of` maps each course
+    position to a position in `teacher_ids`."""
+
+    def __init__(self, course, student, grade, course_teacher):
+        self.grade = grade
+        self.course_ids, self.course = dense_index(course)
+        self.student_ids, self.student = dense_index(student)
+        all_courses, teachers = course_teacher
+        lookup = np.zeros(all_courses.max() + 1 if len(all_courses) else 0,
+                          dtype=np.int64)
+        lookup[all_courses] = teachers
+        self.teacher_ids, self.teacher_of = np.unique(
+            lookup[self.course_ids], return_inverse=True
+        )
+        self.teacher = self.teacher_of[self.course]
+
+    def by_course(self):
+        # order that groups enrollments by course, grades ascending inside
+        # each group: sort by grade, then a stable sort by course (a radix
+        # sort when the course positions fit in 16 bits)
+        by_grade = np.argsort(self.grade)
+        course = self.course[by_grade]
+        if len(self.course_ids) <= np.iinfo(np.uint16).max:
+            course = course.astype(np.uint16)
+        return by_grade[np.argsort(course, kind="stable")]
+
+
+def _float(x):
+    return None if np.isnan(x) else round(float(x), 3)
+
+
+def course_distributions(term, percentiles=PERCENTILES):
+    """Per course: students, mean, standard deviation and percentiles."""
+    if not len(term.grade):
+        return []
+    grade = term.grade[term.by_course()]
+    counts = np.bincount(term.course, minlength=len(term.course_ids))
+    starts = np.cumsum(counts) - counts
+    mean = np.add.reduceat(grade, starts) / counts
+    dev = grade - np.repeat(mean, counts)
+    std = np.sqrt(np.add.reduceat(dev * dev, starts) / counts)
+    # linear interpolation between the closest ranks, as np.percentile does,
+    # for every course at once: grades are sorted within each segment
+    pos = starts[:, None] + \
+        np.asarray(percentiles)[None, :] / 100 * (counts - 1)[:, None]
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, (starts + counts - 1)[:, None])
+    values = grade[lo] + (grade[hi] - grade[lo]) * (pos - lo)
+    return [
+        dict({"course_id": int(cid), "students": int(n),
+              "mean": _float(m), "std": _float(s)},
+             **{f"p{p}": _float(v) for p, v in zip(percentiles, row)})
+        for cid, n, m, s, row in zip(term.course_ids, counts, mean, std,
+                                     values)
+    ]
+
+
+def teacher_inflation(term):
+    """Per teacher: mean grade and how far it sits above the same students'
+    grades from other teachers.
+
+    For every enrollment the student's mean grade with all other teachers
+    is subtracted; a teacher's inflation is the mean of those differences.
+    Students who only ever had this teacher are left out of it.
+    """
+    if not len(term.grade):
+        return []
+    grade, student, teacher = term.grade, term.student, term.teacher
+    k = len(term.teacher_ids)
+    # sums per student, and per (student, teacher) pair
+    s_sum = np.bincount(student, weights=grade)
+    s_n = np.bincount(student)
+    _, pair = np.unique(student * k + teacher, return_inverse=True)
+    p_sum = np.bincount(pair, weights=grade)
+    p_n = np.bincount(pair)
+
+    other_n = s_n[student] - p_n[pair]
+    has = other_n > 0
+    elsewhere = (s_sum[student] - p_sum[pair])[has] / other_n[has]
+    diff = grade[has] - elsewhere
+
+    n = np.bincount(teacher, minlength=k)
+    mean = np.bincount(teacher, weights=grade, minlength=k) / n
+    compared = np.bincount(teacher[has], minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        inflation = np.bincount(teacher[has], weights=diff, minlength=k) \
+            / compared
+    courses = np.bincount(term.teacher_of, minlength=k)
+    return [
+        {"teacher_id": int(tid), "courses": int(c), "grades": int(g),
+         "mean": _float(m), "inflation": _float(i), "compared": int(cmp)}
+        for tid, c, g, m, i, cmp in zip(term.teacher_ids, courses, n, mean,
+                                        inflation, compared)
+    ]
+
+
+def course_correlations(term, top=20, min_students=10):
+    """Pearson correlation of grades between pairs of the `top` most
+    enrolled courses, over the students who took both.
+
+    Builds a students x courses matrix once; every pairwise count, sum and
+    cross product then comes out of a handful of matrix products.
+    """
+    counts = np.bincount(term.course, minlength=len(term.course_ids))
+    picked = np.sort(np.argsort(-counts, kind="stable")[:top])
+    column = np.full(len(counts), -1)
+    column[picked] = np.arange(len(picked))
+    col = column[term.course]
+    keep = col >= 0
+    _, row = dense_index(term.student[keep])
+    x = np.zeros((row.max() + 1 if len(row) else 0, len(picked)))
+    m = np.zeros_like(x)
+    x[row, col[keep]] = term.grade[keep]
+    m[row, col[keep]] = 1.0
+
+    n = m.T @ m                      # students who took both i and j
+    sx = x.T @ m                     # sum of grades in i over those students
+    sxx = (x * x).T @ m
+    sxy = x.T @ x
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sx.T / n
+        var = sxx - sx * sx / n
+        r = cov / np.sqrt(var * var.T)
+    i, j = np.triu_indices(len(picked), 1)
+    ok = (n[i, j] >= min_students) & np.isfinite(r[i, j])
+    i, j = i[ok], j[ok]
+    order = np.argsort(-np.abs(r[i, j]), kind="stable")
+    ids = term.course_ids[picked]
+    return [
+        {"course_a": int(ids[a]), "course_b": int(ids[b]),
+         "students": int(n[a, b]), "r": _float(r[a, b])}
+        for a, b in zip(i[order], j[order])
+    ]
+
+
+def build_report(top_courses=20, min_students=10):
+    start = time.perf_counter()
+    course, student, grade = load_grades()
+    course_teacher = load_teachers()
+    loaded = time.perf_counter()
+    term = Term(course, student, grade, course_teacher)
+    report = {
+        "grades": int(len(grade)),
+        "courses": course_distributions(term),
+        "teachers": teacher_inflation(term),
+        "correlations": course_correlations(term, top_courses, min_students),
+    }
+    done = time.perf_counter()
+    report["timing"] = {"load_ms": round((loaded - start) * 1000, 1),
+                        "compute_ms": round((done - loaded) * 1000, 1)}
+    return report
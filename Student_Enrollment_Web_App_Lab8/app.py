@@ -1,13 +1,31 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import math
 import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 
+import click
 from flask import (
     Flask, render_template, redirect, url_for,
-    flash, request, abort
+    flash, request, abort, jsonify, g, has_request_context,
+    Response, stream_with_context, get_template_attribute, session
 )
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.middleware.proxy_fix import ProxyFix
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
 from flask_login import (
     LoginManager, login_user, logout_user,
     login_required, current_user
@@ -16,31 +34,226 @@ from flask_admin import Admin
 from flask_admin.menu import MenuLink
 from flask_admin.contrib.sqla import ModelView
 
-from models import db, User, Course, Enrollment
-from forms import LoginForm, AdminUserForm
+from models import (
+    db, User, Course, Enrollment, WaitlistEntry, CourseMeeting, DataVersion,
+    Job, CourseGradeStats
+)
+from forms import LoginForm, AdminUserForm, ImportForm
+from cache import TTLCache, VersionedCache
+from perf import RequestProfile, ProfileLog
+from schedule import parse_meetings
+from bulk_import import (
+    KINDS as IMPORT_KINDS, MAX_ERRORS_KEPT as MAX_IMPORT_ERRORS, import_stream
+)
+import passwords
+from ratelimit import SlidingWindowLimiter, make_store
+from fragments import split_slots, fill_slots
+from seatfeed import SeatFeed
+from jobs import JobRunner, enqueue, job_handler
+import gradestats
+
+def database_uri():
+    uri = os.environ.get("DATABASE_URL", "sqlite:///grades.db")
+    # Heroku-style URLs use the scheme SQLAlchemy dropped in 1.4
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://"):]
+    return uri
+
+def engine_options(uri):
+    # connection pooling only matters for server databases; SQLite gets
+    # SQLAlchemy's defaults
+    if uri.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size":     int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow":  int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        "pool_recycle":  int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+    }
 
 app = Flask(__name__)
+db_uri = database_uri()
 app.config.update(
     SECRET_KEY=os.environ.get("SECRET_KEY", "devkey"),
-    SQLALCHEMY_DATABASE_URI="sqlite:///grades.db",
+    SQLALCHEMY_DATABASE_URI=db_uri,
+    SQLALCHEMY_ENGINE_OPTIONS=engine_options(db_uri),
     SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    # "production" (WAL etc.) or "classic" (rollback journal); see
+    # SQLITE_PROFILES below. SQLITE_PRAGMAS overrides single pragmas.
+    SQLITE_PROFILE=os.environ.get("SQLITE_PROFILE", "production"),
+    SQLITE_PRAGMAS={},
+    USER_CACHE_SIZE=int(os.environ.get("USER_CACHE_SIZE", 10000)),
+    USER_CACHE_TTL=float(os.environ.get("USER_CACHE_TTL", 60)),
+    ADMIN_USERS_PER_PAGE=50,
+    # seat counts shown on the student dashboard may lag other workers'
+    # enrollments by this many seconds
+    SEAT_COUNT_TTL=float(os.environ.get("SEAT_COUNT_TTL", 2)),
+    # fingerprinted /static URLs (?v=<hash>) are cached by browsers this long
+    STATIC_IMMUTABLE_MAX_AGE=365 * 24 * 3600,
+    API_BATCH_LIMIT=25,               # operations per /api/enrollments/batch
+    # live seat counts (/api/seats/stream): local changes are pushed in
+    # batches every SEAT_FEED_INTERVAL s, all courses re-read every
+    # SEAT_FEED_POLL s to catch other workers' commits
+    SEAT_FEED_INTERVAL=0.5,
+    SEAT_FEED_POLL=5.0,
+    SEAT_FEED_BACKLOG=256,
+    SEAT_FEED_KEEPALIVE=15.0,
+    # background jobs (teacher deletes, imports, recalculations): runner
+    # threads per process, idle poll interval, and how many rows each
+    # delete batch removes per transaction
+    JOB_WORKERS=int(os.environ.get("JOB_WORKERS", 1)),
+    JOB_POLL_SECONDS=5.0,
+    JOB_STALE_SECONDS=300,
+    JOB_DELETE_BATCH=2000,
+    # per-request SQL profiling, off unless SQL_PROFILING=1; results go to
+    # the "perf" logger and /admin/perf
+    SQL_PROFILING=os.environ.get("SQL_PROFILING") == "1",
+    SQL_PROFILE_HISTORY=200,
+    SQL_SLOW_MS=100,
+    SQL_REPEAT_THRESHOLD=5,
+    # cap on concurrent enroll/unenroll transactions per process (0 = off);
+    # requests beyond it wait up to ENROLL_QUEUE_TIMEOUT seconds
+    ENROLL_MAX_CONCURRENCY=int(os.environ.get("ENROLL_MAX_CONCURRENCY", 0)),
+    ENROLL_QUEUE_TIMEOUT=float(os.environ.get("ENROLL_QUEUE_TIMEOUT", 5)),
+    IMPORT_CHUNK_SIZE=1000,
+    IMPORT_HASH_WORKERS=None,          # None = one per CPU
+    EXPORT_BATCH_SIZE=1000,
+    # admin grade reports (need numpy): how old the last one may get before
+    # a view queues a rebuild, how many of the largest courses are
+    # correlated pairwise, and the fewest shared students a correlation is
+    # shown for
+    ANALYTICS_TTL=60,
+    ANALYTICS_TOP_COURSES=20,
+    ANALYTICS_MIN_STUDENTS=10,
+    # Werkzeug hash method for new/upgraded passwords, and how many KDFs may
+    # run at once (default: all CPUs but one, at most 4, so logins can't
+    # starve every other request; 0 hashes on the request thread)
+    PASSWORD_HASH_METHOD=os.environ.get(
+        "PASSWORD_HASH_METHOD", passwords.DEFAULT_METHOD
+    ),
+    PASSWORD_HASH_WORKERS=(int(os.environ["PASSWORD_HASH_WORKERS"])
+                           if "PASSWORD_HASH_WORKERS" in os.environ else None),
+    # login throttling: (failed attempts, seconds) per client IP and per
+    # username; successful logins don't count, so one NAT or proxy address
+    # full of students isn't capped. memory:// keeps counts in this
+    # process, redis://host/0 shares them between workers
+    RATELIMIT_ENABLED=os.environ.get("RATELIMIT_ENABLED", "1") == "1",
+    LOGIN_LIMIT_PER_IP=(20, 60),
+    LOGIN_LIMIT_PER_USERNAME=(5, 300),
+    RATELIMIT_STORAGE_URL=os.environ.get("RATELIMIT_STORAGE_URL",
+                                         "memory://"),
+    RATELIMIT_MAX_KEYS=100_000,
+    # reverse proxies in front of the app: the client address is then
+    # taken from X-Forwarded-For (and the scheme from X-Forwarded-Proto),
+    # trusting this many hops. Leave at 0 when clients connect directly,
+    # or anyone could pick their own address.
+    TRUSTED_PROXIES=int(os.environ.get("TRUSTED_PROXIES", 0)),
 )
+if app.config["TRUSTED_PROXIES"]:
+    app.wsgi_app = ProxyFix(app.wsgi_app,
+                            x_for=app.config["TRUSTED_PROXIES"],
+                            x_proto=app.config["TRUSTED_PROXIES"])
 db.init_app(app)
+passwords.configure(
+    app.config["PASSWORD_HASH_METHOD"],
+    app.config["PASSWORD_HASH_WORKERS"]
+)
+
+# ─── SQLite pragmas (foreign‑key cascades + performance profile) ─────────────
+SQLITE_PROFILES = {
+    "classic": {
+        "foreign_keys": "ON",
+    },
+    # WAL lets readers run alongside the single writer; NORMAL sync is
+    # durable across application crashes, only a power loss can drop the
+    # last few commits
+    "production": {
+        "foreign_keys": "ON",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,        # ms to wait for a lock before failing
+        "cache_size": -20000,        # negative = KiB, so ~20 MB page cache
+        "mmap_size": 268435456,      # 256 MB memory-mapped reads
+        "temp_store": "MEMORY",
+    },
+}
 
-# ─── Enable SQLite foreign‑key cascades ──────────────────────────────────────
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_conn, conn_record):
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    pragmas = dict(SQLITE_PROFILES[app.config["SQLITE_PROFILE"]])
+    pragmas.update(app.config["SQLITE_PRAGMAS"])
     cursor = dbapi_conn.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON;")
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value};")
     cursor.close()
 
+# ─── Opt-in per-request SQL profiling ────────────────────────────────────────
+perf_log = logging.getLogger("perf")
+profile_log = ProfileLog(app.config["SQL_PROFILE_HISTORY"])
+
+def _current_profile():
+    if has_request_context():
+        return g.get("sql_profile")
+    return None
+
+# the start time rides on the statement's execution context, so a statement
+# that fails (and never reaches after_cursor_execute) leaves nothing behind
+@event.listens_for(Engine, "before_cursor_execute")
+def _profile_start(conn, cursor, statement, params, context, executemany):
+    if _current_profile() is not None and context is not None:
+        context._profile_start = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _profile_end(conn, cursor, statement, params, context, executemany):
+    profile = _current_profile()
+    start = getattr(context, "_profile_start", None)
+    if profile is not None and start is not None:
+        profile.record(statement, time.perf_counter() - start)
+
+@app.before_request
+def start_sql_profile():
+    if app.config["SQL_PROFILING"] and request.endpoint != "static":
+        g.sql_profile = RequestProfile(
+            request.method, request.path, request.endpoint
+        )
+
+@app.after_request
+def finish_sql_profile(response):
+    profile = g.pop("sql_profile", None)
+    if profile is None:
+        return response
+    summary = profile.summary(
+        response.status_code,
+        repeat_threshold=app.config["SQL_REPEAT_THRESHOLD"]
+    )
+    profile_log.add(summary)
+    slow = summary["slowest"] and \
+        summary["slowest"][0]["ms"] >= app.config["SQL_SLOW_MS"]
+    level = logging.WARNING if summary["repeated"] or slow else logging.INFO
+    perf_log.log(level, json.dumps(summary))
+    return response
+
 # ─── Flask‑Login setup ───────────────────────────────────────────────────────
 login_manager = LoginManager(app)
 login_manager.login_view = "login"
 
+# id/username/role barely change, so authenticated requests are served from
+# this cache instead of a users lookup; admin edits/deletes invalidate it
+user_cache = TTLCache(
+    maxsize=app.config["USER_CACHE_SIZE"],
+    ttl=app.config["USER_CACHE_TTL"]
+)
+
+def _load_principal(uid):
+    u = db.session.get(User, uid)
+    return u.principal() if u else None
+
 @login_manager.user_loader
 def load_user(uid):
-    return db.session.get(User, int(uid))
+    uid = int(uid)
+    return user_cache.get_or_load(uid, lambda: _load_principal(uid))
 
 def admin_required(f):
     @wraps(f)
@@ -57,31 +270,120 @@ class SecureModelView(ModelView):
 
 # Flask‑Admin configuration  (only lists updated)
 class CourseAdmin(SecureModelView):
-    column_list  = ["id", "name", "time", "capacity", "teacher.username"]  # added time
+    column_list  = ["id", "name", "time", "capacity", "enrolled_count",
+                    "teacher.username"]                                     # added time
     form_columns = ["name", "time", "capacity", "teacher_id"]              # added time
 
+    # keep the parsed meeting rows in step with Course.time, and let a
+    # raised capacity free seats for whoever is waiting
+    def after_model_change(self, form, model, is_created):
+        sync_course_meetings(model.id, model.time)
+        if not is_created:
+            fill_from_waitlist(model.id)
+        bump_version("catalog")
+        db.session.commit()
+
+    def on_model_delete(self, model):
+        # the database cascades the enrollments; their grades still count
+        # towards each student's GPA until taken out here
+        gradestats.drop_grades(Enrollment.course_id == model.id)
+        bump_version("catalog")
+
 class EnrollmentAdmin(SecureModelView):
     column_list  = ["id", "student.username", "course.name", "grade"]
     form_columns = ["student_id", "course_id", "grade"]
 
+    # admin edits bypass reserve_seat, so move the seat counters by hand
+    # (runs inside the same transaction as the change itself)
+    def on_model_change(self, form, model, is_created):
+        attrs = db.inspect(model).attrs
+        hist = attrs.course_id.history
+        # read before the statements below autoflush the change away
+        old = [] if is_created else [tuple(
+            (a.history.deleted or a.history.unchanged or [None])[0]
+            for a in (attrs.course_id, attrs.student_id, attrs.grade)
+        )]
+        for cid in hist.deleted or ():
+            adjust_seat_count(cid, -1)
+            fill_from_waitlist(cid)
+        for cid in hist.added or ():
+            adjust_seat_count(cid, +1)
+        gradestats.apply_changes(
+            removed=old,
+            added=[(model.course_id, model.student_id, model.grade)]
+        )
+
+    def on_model_delete(self, model):
+        adjust_seat_count(model.course_id, -1)
+        fill_from_waitlist(model.course_id)
+        gradestats.apply_changes(
+            removed=[(model.course_id, model.student_id, model.grade)]
+        )
+
 admin = Admin(app, name="University Admin", template_mode="bootstrap4")
 admin.add_view(CourseAdmin(Course, db.session))
 admin.add_view(EnrollmentAdmin(Enrollment, db.session))
 admin.add_link(MenuLink(name="Users", url="/admin/users"))
+admin.add_link(MenuLink(name="Import", url="/admin/import"))
+admin.add_link(MenuLink(name="Export grades", url="/export/grades.csv"))
+admin.add_link(MenuLink(name="Performance", url="/admin/perf"))
+admin.add_link(MenuLink(name="Jobs", url="/admin/jobs"))
+admin.add_link(MenuLink(name="Analytics", url="/admin/analytics"))
 admin.add_link(MenuLink(name="Logout", url="/logout"))
 
+# ─── Login throttling ──────────────────────────────────────────────────────
+login_store = make_store(app.config["RATELIMIT_STORAGE_URL"],
+                         app.config["RATELIMIT_MAX_KEYS"])
+ip_limiter = SlidingWindowLimiter(login_store, "login-ip",
+                                  *app.config["LOGIN_LIMIT_PER_IP"])
+username_limiter = SlidingWindowLimiter(login_store, "login-user",
+                                        *app.config["LOGIN_LIMIT_PER_USERNAME"])
+
+def client_address():
+    # the real client once ProxyFix (TRUSTED_PROXIES) has rewritten it
+    return request.remote_addr or "-"
+
+def login_throttled(form):
+    # runs before the user lookup and the password hash, so a refused
+    # attempt costs a couple of dict operations
+    if not app.config["RATELIMIT_ENABLED"]:
+        return None
+    retry_after = ip_limiter.peek(client_address())
+    if not retry_after:
+        username = (request.form.get("username") or "").strip()[:50]
+        retry_after = username_limiter.peek(username)
+    if not retry_after:
+        return None
+    flash("Too many login attempts. Try again in "
+          f"{retry_after} seconds.", "danger")
+    resp = app.make_response((render_template("login.html", form=form), 429))
+    resp.headers["Retry-After"] = str(retry_after)
+    return resp
+
 # Routes 
 @app.route("/login", methods=["GET", "POST"])
 def login():
     if current_user.is_authenticated:
         return redirect(url_for("home"))
     form = LoginForm()
+    if request.method == "POST":
+        throttled = login_throttled(form)
+        if throttled is not None:
+            return throttled
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         if user and user.check_password(form.password.data):
+            if passwords.needs_rehash(user.password_hash):
+                # hashed under older KDF settings; upgrade while we have
+                # the plaintext
+                user.set_password(form.password.data)
+                db.session.commit()
+            username_limiter.reset(user.username)
             login_user(user)
             flash(f"Welcome, {user.username}", "success")
             return redirect(url_for("home"))
+        ip_limiter.hit(client_address())
+        username_limiter.hit(form.username.data.strip()[:50])
         flash("Invalid username or password", "danger")
     return render_template("login.html", form=form)
 
@@ -102,12 +404,90 @@ def home():
     return redirect(url_for("student_dashboard"))
 
 # ─── Admin: Custom User CRUD ────────────────────────────────────────────────
+# totals for the paginated user list, per (role, prefix) filter; cleared
+# whenever a user is created, edited or deleted
+user_count_cache = TTLCache(maxsize=256, ttl=30)
+
+def next_prefix(prefix):
+    # the smallest string above every string starting with prefix, in code
+    # point order; None if there is none ("\U0010ffff" alone)
+    while prefix:
+        last = ord(prefix[-1]) + 1
+        if last == 0xD800:                  # surrogates can't be stored
+            last = 0xE000
+        if last <= 0x10FFFF:
+            return prefix[:-1] + chr(last)
+        prefix = prefix[:-1]
+    return None
+
+def starts_with(column, prefix):
+    # a filter the database can answer from an index. SQLite compares text
+    # bytewise (code point order), so a range up to next_prefix is exact
+    # there, while its LIKE ignores case and skips the index. PostgreSQL
+    # ranges follow the collation, which may not keep a prefix's matches
+    # together; LIKE 'prefix%' is exact and uses ix_users_username_pattern.
+    if db.engine.dialect.name != "sqlite":
+        return column.startswith(prefix, autoescape=True)
+    upper = next_prefix(prefix)
+    if upper is None:
+        return column >= prefix
+    return db.and_(column >= prefix, column < upper)
+
 @app.route("/admin/users")
 @login_required
 @admin_required
 def admin_users():
-    users = User.query.order_by(User.id).all()
-    return render_template("admin_users.html", users=users)
+    # keyset pagination: ?after=<id> / ?before=<id> seek on the primary key
+    # instead of OFFSET, so every page costs the same
+    per_page = app.config["ADMIN_USERS_PER_PAGE"]
+    role     = request.args.get("role") or None
+    prefix   = request.args.get("q", "").strip()
+    after    = request.args.get("after", type=int)
+    before   = request.args.get("before", type=int)
+
+    version, changed_at = data_version_info("users")
+    unchanged = not_modified(version, request.query_string,
+                             last_modified=changed_at)
+    if unchanged:
+        return unchanged
+
+    filters = []
+    if role:
+        filters.append(User.role == role)
+    if prefix:
+        filters.append(starts_with(User.username, prefix))
+    stmt = db.select(User.id, User.username, User.role).where(*filters)
+    if before is not None:
+        rows = db.session.execute(
+            stmt.where(User.id < before)
+            .order_by(User.id.desc()).limit(per_page + 1)
+        ).all()
+        has_prev, has_next = len(rows) > per_page, True
+        users = rows[:per_page][::-1]
+    else:
+        if after is not None:
+            stmt = stmt.where(User.id > after)
+        rows = db.session.execute(
+            stmt.order_by(User.id).limit(per_page + 1)
+        ).all()
+        has_prev, has_next = after is not None, len(rows) > per_page
+        users = rows[:per_page]
+
+    total = user_count_cache.get_or_load(
+        (role, prefix),
+        lambda: db.session.scalar(
+            db.select(db.func.count(User.id)).where(*filters)
+        )
+    )
+    return render_template(
+        "admin_users.html",
+        users=users,
+        total=total,
+        role=role,
+        prefix=prefix,
+        has_prev=has_prev and bool(users),
+        has_next=has_next and bool(users)
+    )
 
 @app.route("/admin/users/create", methods=["GET", "POST"])
 @login_required
@@ -118,7 +498,9 @@ def admin_create_user():
         u = User(username=form.username.data, role=form.role.data)
         u.set_password(form.password.data)
         db.session.add(u)
+        bump_version("users")
         db.session.commit()
+        user_count_cache.clear()
         flash("User created.", "success")
         return redirect(url_for("admin_users"))
     return render_template("admin_user_form.html", form=form, action="Create")
@@ -130,11 +512,16 @@ def admin_edit_user(user_id):
     u = User.query.get_or_404(user_id)
     form = AdminUserForm(obj=u)
     if form.validate_on_submit():
+        if u.username != form.username.data:
+            bump_version("catalog")         # teacher names are in it
         u.username = form.username.data
         u.role     = form.role.data
         if form.password.data:
             u.set_password(form.password.data)
+        bump_version("users")
         db.session.commit()
+        user_cache.invalidate(u.id)
+        user_count_cache.clear()
         flash("User updated.", "success")
         return redirect(url_for("admin_users"))
     return render_template("admin_user_form.html", form=form, action="Edit")
@@ -144,44 +531,721 @@ def admin_edit_user(user_id):
 @admin_required
 def admin_delete_user(user_id):
     u = User.query.get_or_404(user_id)
+    if db.session.scalar(
+        db.select(Course.id).where(Course.teacher_id == u.id).limit(1)
+    ):
+        # a teacher takes their courses and every enrollment in them along;
+        # do that in batches off the request thread, with the courses
+        # closed from now on
+        close_courses(u.id)
+        job_id = start_job("delete_user", user_id=u.id)
+        flash(f"Deleting {u.username} in the background (job #{job_id}).",
+              "success")
+        return redirect(url_for("admin_jobs"))
+    freed = release_student_seats(u.id)
+    gradestats.drop_grades(Enrollment.student_id == u.id)
+    db.session.execute(
+        db.delete(WaitlistEntry).where(WaitlistEntry.student_id == u.id)
+    )
+    if u.role == "teacher":
+        bump_version("catalog")             # their courses go with them
+    bump_version("users")
     db.session.delete(u)
+    db.session.flush()
+    for course_id in freed:
+        fill_from_waitlist(course_id)
     db.session.commit()
+    user_cache.invalidate(user_id)
+    user_count_cache.clear()
     flash("User deleted.", "success")
     return redirect(url_for("admin_users"))
 
+@app.route("/admin/cache-stats")
+@login_required
+@admin_required
+def admin_cache_stats():
+    return jsonify(
+        users=user_cache.stats(),
+        user_counts=user_count_cache.stats(),
+        catalog=catalog_cache.stats(),
+        catalog_rows=catalog_rows_cache.stats(),
+        seated_rows=seated_rows_cache.stats(),
+        seat_counts=seat_cache.stats(),
+        login_limits=login_store.stats(),
+        seat_feed=seat_feed.stats()
+    )
+
+@app.route("/admin/import", methods=["GET", "POST"])
+@login_required
+@admin_required
+def admin_import():
+    form = ImportForm()
+    if form.validate_on_submit():
+        # the upload is gone once this request ends, so the job reads a copy
+        upload = form.file.data
+        fmt = "jsonl" if upload.filename.lower().endswith(".jsonl") else "csv"
+        upload_dir = os.path.join(app.instance_path, "uploads")
+        os.makedirs(upload_dir, exist_ok=True)
+        path = os.path.join(
+            upload_dir, f"{form.kind.data}-{time.time_ns()}.{fmt}"
+        )
+        upload.save(path)
+        job_id = start_job("import", kind=form.kind.data, path=path, fmt=fmt,
+                           start_chunk=form.start_chunk.data or 0)
+        flash(f"Import queued (job #{job_id}).", "success")
+        return redirect(url_for("admin_jobs"))
+    return render_template("admin_import.html", form=form)
+
+@app.route("/admin/perf")
+@login_required
+@admin_required
+def admin_perf():
+    return render_template(
+        "admin_perf.html",
+        enabled=app.config["SQL_PROFILING"],
+        endpoints=profile_log.by_endpoint(),
+        recent=profile_log.recent()[:50]
+    )
+
+# ─── Data versions ──────────────────────────────────────────────────────────
+# "catalog" moves whenever a course is added, edited or deleted or a
+# teacher is renamed or deleted; "users" whenever an account is created,
+# edited or deleted. The counters live in the database, so changes made by
+# other workers or the CLI are seen on the next request.
+def data_version(name):
+    return db.session.scalar(
+        db.select(DataVersion.version).where(DataVersion.name == name)
+    ) or 0
+
+def data_version_info(name):
+    # (version, changed_at as an aware UTC datetime or None)
+    row = db.session.execute(
+        db.select(DataVersion.version, DataVersion.changed_at)
+        .where(DataVersion.name == name)
+    ).first()
+    if row is None:
+        return 0, None
+    changed = row.changed_at and row.changed_at.replace(tzinfo=timezone.utc)
+    return row.version, changed
+
+def bump_version(name):
+    # inside the caller's transaction: readers see the new number exactly
+    # when they can see the new data
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    bumped = db.session.execute(
+        db.update(DataVersion)
+        .where(DataVersion.name == name)
+        .values(version=DataVersion.version + 1, changed_at=now)
+    ).rowcount
+    if not bumped:
+        db.session.execute(db.insert(DataVersion).values(
+            name=name, version=1, changed_at=now
+        ))
+
+def imported_changed(kind):
+    # import_stream commits chunk by chunk on its own
+    if kind == "users":
+        bump_version("users")
+        db.session.commit()
+    if kind == "courses":
+        bump_version("catalog")
+        db.session.commit()
+    if kind == "enrollments":
+        # imported rows may carry grades; recount them all
+        gradestats.rebuild()
+        db.session.commit()
+        seat_cache.clear()
+        seat_feed.mark(None)
+
+# ─── Conditional GET ────────────────────────────────────────────────────────
+def not_modified(*parts, last_modified=None):
+    # call once the cheap inputs of a page are known but before rendering.
+    # Returns a 304 when the client's copy matches, else None; either way
+    # the validators are stamped on the response by add_validators below.
+    # Pages are per user, so the viewer is always part of the tag. A
+    # pending flash message isn't part of it, so such a page is always
+    # rendered fresh and sent without validators.
+    if session.get("_flashes"):
+        return None
+    tag = hashlib.blake2b(
+        repr((current_user.get_id(), current_user.username) + parts).encode(),
+        digest_size=12
+    ).hexdigest()
+    g.etag, g.last_modified = tag, last_modified
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(tag)
+    else:
+        fresh = (last_modified is not None
+                 and request.if_modified_since is not None
+                 and last_modified.replace(microsecond=0)
+                 <= request.if_modified_since)
+    return app.response_class(status=304) if fresh else None
+
+@app.after_request
+def add_validators(response):
+    etag = g.pop("etag", None)
+    if etag is None or response.status_code not in (200, 304):
+        return response
+    response.set_etag(etag, weak=True)
+    last_modified = g.pop("last_modified", None)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # private: never shared between users; no-cache: revalidate every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# ─── Fingerprinted static files ─────────────────────────────────────────────
+_static_digests = {}          # path -> (mtime, digest)
+
+def static_digest(filename):
+    path = os.path.join(app.static_folder, filename or "")
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    cached = _static_digests.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as f:
+            digest = hashlib.blake2b(f.read(), digest_size=6).hexdigest()
+        cached = _static_digests[path] = (mtime, digest)
+    return cached[1]
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    # url_for('static', ...) gains ?v=<content hash>, so a changed file gets
+    # a new URL and the old one can be cached forever
+    if endpoint == "static" and "v" not in values:
+        digest = static_digest(values.get("filename"))
+        if digest:
+            values["v"] = digest
+
+@app.after_request
+def cache_fingerprinted_static(response):
+    if (request.endpoint == "static" and response.status_code == 200
+            and request.args.get("v")
+            and request.args["v"] == static_digest(
+                (request.view_args or {}).get("filename"))):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config["STATIC_IMMUTABLE_MAX_AGE"]
+        response.cache_control.immutable = True
+    return response
+
 # ─── Student ────────────────────────────────────────────────────────────────
+CatalogEntry = namedtuple("CatalogEntry", "id name time teacher capacity")
+
+# course id -> CatalogEntry, in id order; shared by every request and
+# rebuilt only when the "catalog" version moves
+catalog_cache = VersionedCache()
+# (digest, {course id -> enrolled_count}); seats change far more often than
+# the catalog, so they get their own short-lived layer. The digest is of the
+# counts themselves, so it is the same in every worker for the same data.
+seat_cache = TTLCache(maxsize=1, ttl=app.config["SEAT_COUNT_TTL"])
+# the rendered "All Available Classes" rows, shared by every student: the
+# template output per catalog version, and that with the seat counts and
+# full/open buttons filled in per (catalog version, seat digest). A view
+# then only splices in the student's own action cells.
+catalog_rows_cache = VersionedCache()
+seated_rows_cache = VersionedCache()
+
+def _load_catalog():
+    stmt = (
+        db.select(
+            Course.id, Course.name, Course.time,
+            User.username.label("teacher"), Course.capacity
+        )
+        .join(User, Course.teacher_id == User.id)
+        .where(Course.closed.is_(False))
+        .order_by(Course.id)
+    )
+    return {row.id: CatalogEntry(*row) for row in db.session.execute(stmt)}
+
+def course_catalog(version=None):
+    if version is None:
+        version = data_version("catalog")
+    return catalog_cache.get(version, _load_catalog)
+
+def _load_seats():
+    counts = db.session.execute(
+        db.select(Course.id, Course.enrolled_count).order_by(Course.id)
+    ).all()
+    digest = hashlib.blake2b(repr(counts).encode(), digest_size=12).hexdigest()
+    return digest, dict(counts)
+
+def seat_counts():
+    return seat_cache.get_or_load("all", _load_seats)
+
+def _render_catalog_rows(catalog):
+    # (split fragment, {course id: action cell of the full course}); the
+    # fragment's own action cells show the open course
+    action = get_template_attribute("catalog_rows.html", "course_action")
+    return (
+        split_slots(render_template("catalog_rows.html",
+                                    courses=catalog.values())),
+        {cid: str(action(c, "full")) for cid, c in catalog.items()}
+    )
+
+def _fill_seats(fragment, full, catalog, seats):
+    # the rendered rows with every seat count filled in and full courses
+    # switched to "Join Waitlist"; the action cells stay slots
+    html, spans = fragment
+    fills = {}
+    for cid, c in catalog.items():
+        taken = seats.get(cid, 0)
+        fills[f"s{cid}"] = f"{taken}/{c.capacity}"
+        start, end = spans[str(cid)]
+        cell = full[cid] if taken >= c.capacity else html[start:end]
+        fills[str(cid)] = f"<!--slot:{cid}-->{cell}<!--/slot-->"
+    return split_slots(fill_slots(fragment, fills))
+
+def catalog_rows(version, catalog, seat_digest, seats, own):
+    # the shared rows with `own` ({course id: markup}) in the action cells
+    # of the student's own courses; per view that is len(own) splices
+    fragment, full = catalog_rows_cache.get(
+        version, lambda: _render_catalog_rows(catalog)
+    )
+    seated = seated_rows_cache.get(
+        (version, seat_digest),
+        lambda: _fill_seats(fragment, full, catalog, seats)
+    )
+    return fill_slots(seated, {str(cid): markup
+                               for cid, markup in own.items()})
+
+def _load_feed_counts(course_ids):
+    stmt = db.select(Course.id, Course.enrolled_count)
+    if course_ids is not None:
+        stmt = stmt.where(Course.id.in_(course_ids))
+    return dict(db.session.execute(stmt).all())
+
+seat_feed = SeatFeed(
+    _load_feed_counts, app.app_context,
+    interval=app.config["SEAT_FEED_INTERVAL"],
+    poll=app.config["SEAT_FEED_POLL"],
+    backlog=app.config["SEAT_FEED_BACKLOG"],
+    keepalive=app.config["SEAT_FEED_KEEPALIVE"]
+)
+
+def seats_changed(course_ids=None):
+    # remember which courses' counters moved (None = possibly any); acted
+    # on once the caller's transaction commits
+    info = db.session.info
+    if course_ids is None or info.get("seats_changed", ()) is None:
+        info["seats_changed"] = None
+    else:
+        info.setdefault("seats_changed", set()).update(course_ids)
+
+@event.listens_for(Session, "after_commit")
+def _publish_seat_changes(session):
+    changed = session.info.pop("seats_changed", False)
+    if changed is not False:
+        seat_cache.clear()
+        seat_feed.mark(changed)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_seat_change(session):
+    session.info.pop("seats_changed", None)
+
 @app.route("/student")
 @login_required
 def student_dashboard():
     if current_user.role != "student":
         return redirect(url_for("home"))
-    enrolled = current_user.enrollments
-    enrolled_ids = [e.course_id for e in enrolled]
-    all_courses = Course.query.all()
+    version = data_version("catalog")
+    seat_digest, seats = seat_counts()
+    enrollments = db.session.execute(
+        db.select(Enrollment.course_id, Enrollment.grade)
+        .filter_by(student_id=current_user.id)
+        .order_by(Enrollment.id)
+    ).all()
+    waitlisted = student_waitlists(current_user.id)
+    conflicts = student_conflicts(current_user.id)
+    grades = gradestats.student_stats(current_user.id)
+    class_stats = gradestats.course_stats(e.course_id for e in enrollments)
+    unchanged = not_modified(
+        version, seat_digest, [tuple(e) for e in enrollments],
+        sorted(waitlisted.items()), sorted(conflicts),
+        grades, sorted(class_stats.items())
+    )
+    if unchanged:
+        return unchanged
+
+    catalog = course_catalog(version)
+    enrolled = [(e, catalog[e.course_id]) for e in enrollments
+                if e.course_id in catalog]
+
+    # the catalog table is shared; only the rows this student is enrolled
+    # in, waitlisted for or clashing with get their own action cell
+    action = get_template_attribute("catalog_rows.html", "course_action")
+    # waitlisted wins over conflict so the Leave button stays reachable
+    own = {}
+    for course_id in conflicts:
+        own[course_id] = ("conflict", None)
+    for course_id, position in waitlisted.items():
+        own[course_id] = ("waitlisted", position)
+    for e in enrollments:
+        own[e.course_id] = ("enrolled", None)
+    rows = catalog_rows(version, catalog, seat_digest, seats, {
+        cid: action(catalog[cid], state, position, cid in conflicts)
+        for cid, (state, position) in own.items() if cid in catalog
+    })
     return render_template(
         "student_dashboard.html",
         enrolled=enrolled,
-        enrolled_ids=enrolled_ids,
-        all_courses=all_courses
+        grades=grades,
+        class_stats=class_stats,
+        conflicts=conflicts,
+        seats=seats,
+        catalog_rows=rows
+    )
+
+# ─── Seat counters ──────────────────────────────────────────────────────────
+def adjust_seat_count(course_id, delta):
+    db.session.execute(
+        db.update(Course)
+        .where(Course.id == course_id)
+        .values(enrolled_count=Course.enrolled_count + delta)
+    )
+    seats_changed([course_id])
+
+def take_seat(course_id):
+    # the guarded UPDATE takes the seat only while enrolled_count < capacity
+    # and locks the course row, so two concurrent requests can never both
+    # take the last seat; closed courses have none to give
+    taken = db.session.execute(
+        db.update(Course)
+        .where(Course.id == course_id,
+               Course.enrolled_count < Course.capacity,
+               Course.closed.is_(False))
+        .values(enrolled_count=Course.enrolled_count + 1)
+    ).rowcount == 1
+    if taken:
+        seats_changed([course_id])
+    return taken
+
+def insert_enrollment(student_id, course_id):
+    # add the row unless the student already has it; True if inserted.
+    # RETURNING rather than rowcount: psycopg reports -1 for INSERT..SELECT
+    already = db.exists().where(
+        Enrollment.student_id == student_id,
+        Enrollment.course_id == course_id
+    )
+    return db.session.execute(
+        db.insert(Enrollment).from_select(
+            ["student_id", "course_id"],
+            db.select(db.literal(student_id), db.literal(course_id))
+            .where(~already)
+        ).returning(Enrollment.id)
+    ).first() is not None
+
+def lock_student(student_id):
+    # row lock on the student, so requests that change one student's
+    # schedule run one at a time (SQLite already serializes writers)
+    db.session.execute(
+        db.select(User.id).where(User.id == student_id).with_for_update()
     )
 
+def lock_courses(course_ids):
+    # row locks on several courses at once, taken in id order so two
+    # requests locking overlapping sets can't each wait on the other
+    db.session.execute(
+        db.select(Course.id).where(Course.id.in_(sorted(set(course_ids))))
+        .order_by(Course.id).with_for_update()
+    )
+
+def reserve_seat(student_id, course_id):
+    """Enroll the student, or queue them on the waitlist when the course is
+    full, in the caller's transaction. Returns (status, detail):
+
+      ("enrolled", None)            ("waitlisted", position)
+      ("already_enrolled", None)    ("conflict", name of the clashing course)
+
+    The seat is taken first (locking the course row), then the student row,
+    and only then is the schedule checked, so it sees every course the
+    student holds, including one another of their requests just committed.
+    fill_from_waitlist locks in the same course-then-student order.
+    """
+    seated = take_seat(course_id)
+    lock_student(student_id)
+    clash = schedule_conflict(student_id, course_id)
+    if seated and not clash and insert_enrollment(student_id, course_id):
+        db.session.execute(db.delete(WaitlistEntry).where(
+            WaitlistEntry.student_id == student_id,
+            WaitlistEntry.course_id == course_id
+        ))
+        return "enrolled", None
+    if seated:
+        adjust_seat_count(course_id, -1)
+    if clash:
+        return "conflict", clash
+    if seated or db.session.scalar(db.select(db.exists().where(
+        Enrollment.student_id == student_id,
+        Enrollment.course_id == course_id
+    ))):
+        return "already_enrolled", None
+    return "waitlisted", join_waitlist(student_id, course_id)
+
+def release_seat(student_id, course_id):
+    deleted = db.session.execute(
+        db.delete(Enrollment)
+        .where(Enrollment.student_id == student_id,
+               Enrollment.course_id == course_id)
+        .returning(Enrollment.course_id, Enrollment.student_id,
+                   Enrollment.grade)
+    ).all()
+    if deleted:
+        adjust_seat_count(course_id, -len(deleted))
+        gradestats.apply_changes(removed=deleted)
+    return bool(deleted)
+
+def release_student_seats(student_id):
+    # hand back every seat held by a student who is about to be deleted;
+    # returns the ids of the courses that got a seat back
+    course_ids = db.session.scalars(
+        db.select(Enrollment.course_id)
+        .where(Enrollment.student_id == student_id)
+    ).all()
+    held = (
+        db.select(db.func.count(Enrollment.id))
+        .where(Enrollment.student_id == student_id,
+               Enrollment.course_id == Course.id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        db.update(Course)
+        .where(Course.id.in_(
+            db.select(Enrollment.course_id)
+            .where(Enrollment.student_id == student_id)
+        ))
+        .values(enrolled_count=Course.enrolled_count - held)
+    )
+    seats_changed(course_ids)
+    return course_ids
+
+def reconcile_seat_counts():
+    # recount every course from the enrollments table; returns how many
+    # courses had drifted
+    actual = (
+        db.select(db.func.count(Enrollment.id))
+        .where(Enrollment.course_id == Course.id)
+        .scalar_subquery()
+    )
+    seats_changed()
+    return db.session.execute(
+        db.update(Course)
+        .where(Course.enrolled_count != actual)
+        .values(enrolled_count=actual)
+    ).rowcount
+
+# ─── Schedule conflicts ─────────────────────────────────────────────────────
+def sync_course_meetings(course_id, time_text):
+    db.session.execute(
+        db.delete(CourseMeeting).where(CourseMeeting.course_id == course_id)
+    )
+    meetings = parse_meetings(time_text)
+    if meetings:
+        db.session.execute(db.insert(CourseMeeting), [
+            {"course_id": course_id, "day": d, "start_min": s, "end_min": e}
+            for d, s, e in meetings
+        ])
+
+def rebuild_course_meetings():
+    # re-parse every Course.time; returns how many courses had no usable time
+    db.session.execute(db.delete(CourseMeeting))
+    rows, unparsed = [], 0
+    for course_id, time_text in db.session.execute(
+        db.select(Course.id, Course.time)
+    ):
+        meetings = parse_meetings(time_text)
+        unparsed += not meetings
+        rows += [
+            {"course_id": course_id, "day": d, "start_min": s, "end_min": e}
+            for d, s, e in meetings
+        ]
+    if rows:
+        db.session.execute(db.insert(CourseMeeting), rows)
+    return unparsed
+
+def _overlapping(mine, other):
+    return db.and_(
+        other.day == mine.day,
+        other.start_min < mine.end_min,
+        mine.start_min < other.end_min,
+        other.course_id != mine.course_id
+    )
+
+def schedule_conflict(student_id, course_id):
+    # name of one of the student's courses that overlaps course_id, or None
+    new, held = db.aliased(CourseMeeting), db.aliased(CourseMeeting)
+    return db.session.scalar(
+        db.select(Course.name)
+        .select_from(new)
+        .join(held, _overlapping(new, held))
+        .join(Enrollment, db.and_(
+            Enrollment.course_id == held.course_id,
+            Enrollment.student_id == student_id
+        ))
+        .join(Course, Course.id == held.course_id)
+        .where(new.course_id == course_id)
+        .limit(1)
+    )
+
+def student_conflicts(student_id):
+    # ids of courses overlapping any of the student's other courses; covers
+    # both clashes inside their schedule and catalog courses they can't take
+    mine, other = db.aliased(CourseMeeting), db.aliased(CourseMeeting)
+    return set(db.session.scalars(
+        db.select(other.course_id).distinct()
+        .select_from(Enrollment)
+        .join(mine, mine.course_id == Enrollment.course_id)
+        .join(other, _overlapping(mine, other))
+        .where(Enrollment.student_id == student_id)
+    ))
+
+# ─── Waitlists & admission queue ────────────────────────────────────────────
+def join_waitlist(student_id, course_id):
+    # returns the student's position in line (1 = next); the caller commits.
+    # Already waiting is not an error, the insert is just skipped; only a
+    # concurrent request queueing the same student can hit the unique index
+    already = db.exists().where(
+        WaitlistEntry.student_id == student_id,
+        WaitlistEntry.course_id == course_id
+    )
+    db.session.execute(
+        db.insert(WaitlistEntry).from_select(
+            ["student_id", "course_id"],
+            db.select(db.literal(student_id), db.literal(course_id))
+            .where(~already)
+        )
+    )
+    return waitlist_position(student_id, course_id)
+
+def waitlist_position(student_id, course_id):
+    mine = (
+        db.select(WaitlistEntry.id)
+        .where(WaitlistEntry.student_id == student_id,
+               WaitlistEntry.course_id == course_id)
+        .scalar_subquery()
+    )
+    return db.session.scalar(
+        db.select(db.func.count(WaitlistEntry.id))
+        .where(WaitlistEntry.course_id == course_id,
+               WaitlistEntry.id <= mine)
+    ) or None
+
+def student_waitlists(student_id):
+    # {course_id: position} for every course the student is waiting on
+    w2 = db.aliased(WaitlistEntry)
+    position = (
+        db.select(db.func.count(w2.id))
+        .where(w2.course_id == WaitlistEntry.course_id,
+               w2.id <= WaitlistEntry.id)
+        .scalar_subquery()
+    )
+    rows = db.session.execute(
+        db.select(WaitlistEntry.course_id, position)
+        .where(WaitlistEntry.student_id == student_id)
+    ).all()
+    return dict(rows)
+
+def _next_in_line(course_id, passed_over):
+    # earliest waitlist entry whose student can take the course without a
+    # time clash, with that student locked; clashing entries keep their
+    # place in line but are added to passed_over
+    while True:
+        nxt = db.session.execute(
+            db.select(WaitlistEntry.id, WaitlistEntry.student_id)
+            .where(WaitlistEntry.course_id == course_id,
+                   WaitlistEntry.id.not_in(passed_over))
+            .order_by(WaitlistEntry.id)
+            .limit(1)
+        ).first()
+        if nxt is None:
+            return None
+        lock_student(nxt.student_id)
+        if not schedule_conflict(nxt.student_id, course_id):
+            return nxt
+        passed_over.append(nxt.id)
+
+def fill_from_waitlist(course_id):
+    # promote waiting students into free seats, in order, inside the
+    # caller's transaction. The seat is taken (locking the course row)
+    # before the next entry is read, so concurrent promoters cannot hand
+    # the same seat or the same entry out twice. Students whose schedule
+    # now clashes with the course are skipped, checked the same way
+    # reserve_seat checks. Returns promoted ids.
+    promoted, passed_over = [], []
+    while take_seat(course_id):
+        nxt = _next_in_line(course_id, passed_over)
+        if nxt is None:
+            adjust_seat_count(course_id, -1)
+            break
+        db.session.execute(
+            db.delete(WaitlistEntry).where(WaitlistEntry.id == nxt.id)
+        )
+        if insert_enrollment(nxt.student_id, course_id):
+            promoted.append(nxt.student_id)
+        else:
+            adjust_seat_count(course_id, -1)
+    return promoted
+
+class AdmissionQueue:
+    # caps how many enroll/unenroll transactions run at once in this
+    # process so a registration-day burst queues here instead of piling
+    # onto the database's write lock
+    def __init__(self, limit, timeout):
+        self._slots = threading.BoundedSemaphore(limit) if limit else None
+        self.timeout = timeout
+
+    @contextmanager
+    def slot(self):
+        if self._slots is None:
+            yield True
+            return
+        if not self._slots.acquire(timeout=self.timeout):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self._slots.release()
+
+admission_queue = AdmissionQueue(
+    app.config["ENROLL_MAX_CONCURRENCY"],
+    app.config["ENROLL_QUEUE_TIMEOUT"]
+)
+
 @app.route("/student/enroll/<int:course_id>")
 @login_required
 def student_enroll(course_id):
     if current_user.role != "student":
         return redirect(url_for("home"))
     course = Course.query.get_or_404(course_id)
-    if course.id in [e.course_id for e in current_user.enrollments]:
-        flash("Already enrolled.", "warning")
-    elif len(course.enrollments) >= course.capacity:
-        flash("Class full.", "warning")
+    if course.closed:
+        abort(404)
+    name = course.name
+    with admission_queue.slot() as admitted:
+        if not admitted:
+            flash("Registration is busy, please try again.", "warning")
+            return redirect(url_for("student_dashboard"))
+        try:
+            status, detail = reserve_seat(current_user.id, course.id)
+        except IntegrityError:        # double-click, already queued
+            db.session.rollback()
+            status = "waitlisted"
+            detail = waitlist_position(current_user.id, course.id)
+        if status in ("enrolled", "waitlisted"):
+            db.session.commit()
+        else:
+            db.session.rollback()
+    if status == "enrolled":
+        flash(f"Enrolled in {name}", "success")
+    elif status == "waitlisted":
+        flash(f"Class full. You are #{detail} on the waitlist.", "warning")
+    elif status == "conflict":
+        flash(f"{name} overlaps with {detail}.", "warning")
     else:
-        db.session.add(Enrollment(
-            student_id=current_user.id,
-            course_id=course.id
-        ))
-        db.session.commit()
-        flash(f"Enrolled in {course.name}", "success")
+        flash("Already enrolled.", "warning")
     return redirect(url_for("student_dashboard"))
 
 @app.route("/student/unenroll/<int:course_id>")
@@ -189,58 +1253,848 @@ def student_enroll(course_id):
 def student_unenroll(course_id):
     if current_user.role != "student":
         return redirect(url_for("home"))
-    enrollment = Enrollment.query.filter_by(
-        student_id=current_user.id, course_id=course_id
-    ).first()
-    if not enrollment:
-        flash("You are not enrolled in this course.", "warning")
-    else:
-        db.session.delete(enrollment)
-        db.session.commit()
-        flash("Successfully unenrolled.", "success")
+    with admission_queue.slot() as admitted:
+        if not admitted:
+            flash("Registration is busy, please try again.", "warning")
+        elif not release_seat(current_user.id, course_id):
+            flash("You are not enrolled in this course.", "warning")
+        else:
+            fill_from_waitlist(course_id)
+            db.session.commit()
+            flash("Successfully unenrolled.", "success")
+    return redirect(url_for("student_dashboard"))
+
+@app.route("/student/waitlist/leave/<int:course_id>")
+@login_required
+def student_leave_waitlist(course_id):
+    if current_user.role != "student":
+        return redirect(url_for("home"))
+    db.session.execute(db.delete(WaitlistEntry).where(
+        WaitlistEntry.student_id == current_user.id,
+        WaitlistEntry.course_id == course_id
+    ))
+    db.session.commit()
+    flash("Left the waitlist.", "success")
     return redirect(url_for("student_dashboard"))
 
+# ─── JSON API ───────────────────────────────────────────────────────────────
+# The student flows above as data instead of pages, with the same seat,
+# duplicate, time-conflict and waitlist rules. Uses the normal session
+# cookie; the batch endpoint only accepts application/json, which a
+# cross-site form cannot send.
+def api_login_required(f):
+    @wraps(f)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify(error="login required"), 401
+        return f(*args, **kwargs)
+    return wrapped
+
+@app.route("/api/catalog")
+@api_login_required
+def api_catalog():
+    version = data_version("catalog")
+    seat_digest, seats = seat_counts()
+    unchanged = not_modified(version, seat_digest)
+    if unchanged:
+        return unchanged
+    return jsonify(courses=[
+        dict(c._asdict(), enrolled=seats.get(c.id, 0))
+        for c in course_catalog(version).values()
+    ])
+
+@app.route("/api/enrollments")
+@api_login_required
+def api_my_enrollments():
+    if current_user.role != "student":
+        return jsonify(error="students only"), 403
+    enrollments = db.session.execute(
+        db.select(Enrollment.course_id, Enrollment.grade)
+        .filter_by(student_id=current_user.id)
+        .order_by(Enrollment.id)
+    ).all()
+    waitlisted = student_waitlists(current_user.id)
+    # course names and times come from the catalog, so its version is
+    # part of the tag
+    version = data_version("catalog")
+    unchanged = not_modified(version, [tuple(e) for e in enrollments],
+                             sorted(waitlisted.items()))
+    if unchanged:
+        return unchanged
+    catalog = course_catalog(version)
+    return jsonify(
+        enrollments=[
+            {"course_id": e.course_id, "name": catalog[e.course_id].name,
+             "time": catalog[e.course_id].time, "grade": e.grade}
+            for e in enrollments if e.course_id in catalog
+        ],
+        waitlist=[{"course_id": cid, "position": pos}
+                  for cid, pos in sorted(waitlisted.items())]
+    )
+
+def parse_batch(body):
+    # [(op, course_id), ...] or an error message
+    ops = body.get("operations") if isinstance(body, dict) else None
+    if not isinstance(ops, list) or not ops:
+        return None, "expected {\"operations\": [{\"op\", \"course_id\"}, ...]}"
+    if len(ops) > app.config["API_BATCH_LIMIT"]:
+        return None, f"at most {app.config['API_BATCH_LIMIT']} operations"
+    parsed = []
+    for n, item in enumerate(ops):
+        op = item.get("op") if isinstance(item, dict) else None
+        cid = item.get("course_id") if isinstance(item, dict) else None
+        if op not in ("enroll", "drop") or type(cid) is not int:
+            return None, f"operation {n}: need op enroll|drop and integer course_id"
+        parsed.append((op, cid))
+    return parsed, None
+
+def apply_enrollment_batch(student_id, ops):
+    # runs every operation in the caller's transaction and returns one result
+    # per operation, in request order. Drops go first, so a cart that swaps
+    # a course for one clashing with it works in a single call.
+    # Every course the batch touches is locked up front, then the student,
+    # keeping reserve_seat's course-then-student order across all the ops.
+    lock_courses(cid for _, cid in ops)
+    lock_student(student_id)
+    catalog = course_catalog()
+    enrolled = set(db.session.scalars(
+        db.select(Enrollment.course_id)
+        .where(Enrollment.student_id == student_id)
+    ))
+    results = [None] * len(ops)
+    for i in sorted(range(len(ops)), key=lambda i: ops[i][0] != "drop"):
+        op, cid = ops[i]
+        result = {"op": op, "course_id": cid}
+        if op == "drop":
+            if release_seat(student_id, cid):
+                fill_from_waitlist(cid)
+                enrolled.discard(cid)
+                result["status"] = "dropped"
+            else:
+                result["status"] = "not_enrolled"
+        elif cid not in catalog:
+            result["status"] = "not_found"
+        elif cid in enrolled:
+            result["status"] = "already_enrolled"
+        else:
+            status, detail = reserve_seat(student_id, cid)
+            result["status"] = status
+            if status == "conflict":
+                result["conflicts_with"] = detail
+            elif status == "waitlisted":
+                result["position"] = detail
+            elif status == "enrolled":
+                enrolled.add(cid)
+        results[i] = result
+    return results
+
+@app.route("/api/enrollments/batch", methods=["POST"])
+@api_login_required
+def api_enrollment_batch():
+    if current_user.role != "student":
+        return jsonify(error="students only"), 403
+    if not request.is_json:
+        return jsonify(error="expected application/json"), 415
+    ops, error = parse_batch(request.get_json(silent=True))
+    if error:
+        return jsonify(error=error), 400
+    with admission_queue.slot() as admitted:
+        if not admitted:
+            return jsonify(error="registration is busy, try again"), 503
+        try:
+            results = apply_enrollment_batch(current_user.id, ops)
+            db.session.commit()
+        except (IntegrityError, OperationalError):
+            # another request for this student changed the same rows, or
+            # the database broke a deadlock / serialization failure
+            db.session.rollback()
+            return jsonify(error="conflicting concurrent change, retry"), 409
+    return jsonify(results=results)
+
+@app.route("/api/seats/stream")
+@api_login_required
+def api_seat_stream():
+    # server-sent events: a "snapshot" of every course's enrolled count,
+    # then "seats" events with just the counts that changed. EventSource
+    # resumes from Last-Event-ID when the backlog still covers it.
+    stream = seat_feed.subscribe(
+        lambda: _load_feed_counts(None),
+        request.headers.get("Last-Event-ID", type=int)
+    )
+    return Response(stream, mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",          # don't let nginx buffer it
+    })
+
 # ─── Teacher ────────────────────────────────────────────────────────────────
 @app.route("/teacher")
 @login_required
 def teacher_dashboard():
     if current_user.role != "teacher":
         return redirect(url_for("home"))
-    return render_template(
-        "teacher_dashboard.html",
-        courses=current_user.taught_courses
-    )
+    courses = db.session.execute(
+        db.select(Course.id, Course.name, Course.enrolled_count,
+                  CourseGradeStats.graded, CourseGradeStats.grade_sum)
+        .outerjoin(CourseGradeStats)
+        .filter(Course.teacher_id == current_user.id)
+        .order_by(Course.id)
+    ).all()
+    unchanged = not_modified([tuple(c) for c in courses])
+    if unchanged:
+        return unchanged
+    return render_template("teacher_dashboard.html", courses=courses)
 
 @app.route("/teacher/course/<int:course_id>", methods=["GET", "POST"])
 @login_required
 def teacher_course(course_id):
     if current_user.role != "teacher":
         return redirect(url_for("home"))
-    course = Course.query.get_or_404(course_id)
+    course = db.first_or_404(db.select(Course).where(Course.id == course_id))
     if course.teacher_id != current_user.id:
         flash("Not your class.", "danger")
         return redirect(url_for("teacher_dashboard"))
 
+    roster = db.session.execute(
+        db.select(Enrollment.id, Enrollment.student_id, Enrollment.grade,
+                  User.username)
+        .join(User, Enrollment.student_id == User.id)
+        .where(Enrollment.course_id == course.id)
+        .order_by(Enrollment.id)
+    ).all()
+    errors, submitted = {}, {}
+
     if request.method == "POST":
-        for enr in course.enrollments:
-            g = request.form.get(f"grade_{enr.id}")
-            if g is not None:
-                enr.grade = float(g)
-        db.session.commit()
-        flash("Grades updated.", "success")
+        changed = []
+        for enr in roster:
+            raw = request.form.get(f"grade_{enr.id}")
+            if raw is None:
+                continue
+            submitted[enr.id] = raw
+            grade, error = parse_grade(raw)
+            if error:
+                errors[enr.id] = f"{enr.username}: {error}"
+            elif grade != enr.grade:
+                changed.append((enr, grade))
+        if errors:
+            for msg in errors.values():
+                flash(msg, "danger")
+        else:
+            # each row is only updated if it still holds the grade read
+            # above, so the totals move by exactly what was replaced; a row
+            # another save changed in between is left alone and reported
+            # (SQLite doesn't lock anything until the first write, so
+            # locking the course up front wouldn't cover it)
+            applied, skipped = [], []
+            for enr, grade in changed:
+                matched = db.session.execute(
+                    db.update(Enrollment)
+                    .where(Enrollment.id == enr.id,
+                           Enrollment.grade.is_not_distinct_from(enr.grade))
+                    .values(grade=grade)
+                ).rowcount == 1
+                (applied if matched else skipped).append((enr, grade))
+            gradestats.apply_changes(
+                removed=[(course.id, enr.student_id, enr.grade)
+                         for enr, _ in applied],
+                added=[(course.id, enr.student_id, grade)
+                       for enr, grade in applied]
+            )
+            db.session.commit()
+            flash(f"Grades updated ({len(applied)} changed).", "success")
+            for enr, _ in skipped:
+                flash(f"{enr.username}: changed by someone else meanwhile, "
+                      "not saved.", "warning")
+            return redirect(url_for("teacher_course", course_id=course.id))
+
+    return render_template(
+        "teacher_course.html",
+        course=course,
+        roster=roster,
+        errors=errors,
+        submitted=submitted,
+        stats=gradestats.course_stats([course.id]).get(course.id),
+        bucket_labels=[gradestats.bucket_label(n)
+                       for n in range(gradestats.BUCKETS)]
+    )
+
+def parse_grade(raw):
+    # returns (grade, error); a blank field clears the grade
+    raw = raw.strip()
+    if not raw:
+        return None, None
+    try:
+        grade = float(raw)
+    except ValueError:
+        return None, f"{raw!r} is not a number"
+    if not math.isfinite(grade) or grade < 0:
+        return None, f"{raw!r} is not a valid grade"
+    return grade, None
+
+# ─── Gradebook export ───────────────────────────────────────────────────────
+EXPORT_COLUMNS = ["enrollment_id", "course_id", "course", "teacher",
+                  "student_id", "student", "grade"]
+
+@app.route("/export/grades.<any(csv, jsonl):fmt>")
+@login_required
+def export_grades(fmt):
+    # streams rows straight from a server-side cursor, so memory stays flat
+    # and the first bytes go out before the query has finished.
+    # ?course_id= / ?teacher_id= / ?student_id= filter; teachers only ever
+    # see their own courses
+    if current_user.role not in ("teacher", "admin"):
+        abort(404)
+    Student, Teacher = db.aliased(User), db.aliased(User)
+    stmt = (
+        db.select(
+            Enrollment.id, Course.id, Course.name, Teacher.username,
+            Student.id, Student.username, Enrollment.grade
+        )
+        .join(Course, Enrollment.course_id == Course.id)
+        .join(Teacher, Course.teacher_id == Teacher.id)
+        .join(Student, Enrollment.student_id == Student.id)
+        .order_by(Enrollment.course_id, Enrollment.id)
+    )
+    teacher_id = request.args.get("teacher_id", type=int)
+    if current_user.role == "teacher":
+        teacher_id = current_user.id
+    for column, value in (
+        (Course.teacher_id, teacher_id),
+        (Enrollment.course_id, request.args.get("course_id", type=int)),
+        (Enrollment.student_id, request.args.get("student_id", type=int)),
+    ):
+        if value is not None:
+            stmt = stmt.where(column == value)
+    batch = app.config["EXPORT_BATCH_SIZE"]
+
+    def generate():
+        rows = db.session.execute(stmt.execution_options(yield_per=batch))
+        buf = io.StringIO()
+        if fmt == "csv":
+            writer = csv.writer(buf)
+            writer.writerow(EXPORT_COLUMNS)
+        for part in rows.partitions():
+            for row in part:
+                if fmt == "csv":
+                    writer.writerow(row)
+                else:
+                    buf.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))))
+                    buf.write("\n")
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        yield buf.getvalue()
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=grades.{fmt}"
+        }
+    )
+
+# ─── Grade analytics ────────────────────────────────────────────────────────
+ANALYTICS_COLUMNS = {
+    "courses": ["course_id", "course", "teacher", "students", "mean", "std",
+                "p10", "p25", "p50", "p75", "p90"],
+    "teachers": ["teacher_id", "teacher", "courses", "grades", "mean",
+                 "inflation", "compared"],
+    "correlations": ["course_a", "name_a", "course_b", "name_b", "students",
+                     "r"],
+}
+# Reports are built by "grade_report" background jobs and kept as the job's
+# result, so every worker process serves the same one. Views show the
+# latest finished report right away and, once it is older than
+# ANALYTICS_TTL, queue one rebuild to replace it; nobody waits for a build.
+# Parsed reports are cached per job id.
+report_cache = VersionedCache()
+_report_refresh = threading.Lock()
+
+def _build_grade_report(analytics):
+    report = analytics.build_report(app.config["ANALYTICS_TOP_COURSES"],
+                                    app.config["ANALYTICS_MIN_STUDENTS"])
+    catalog = course_catalog()
+    teachers = dict(db.session.execute(
+        db.select(User.id, User.username).where(User.role == "teacher")
+    ).all())
+
+    def name(course_id):
+        entry = catalog.get(course_id)
+        return entry.name if entry else None
+
+    for row in report["courses"]:
+        entry = catalog.get(row["course_id"])
+        row["course"] = entry.name if entry else None
+        row["teacher"] = entry.teacher if entry else None
+    for row in report["teachers"]:
+        row["teacher"] = teachers.get(row["teacher_id"])
+    # most inflated first; teachers with nothing to compare against last
+    report["teachers"].sort(key=lambda row: (row["inflation"] is None,
+                                             -(row["inflation"] or 0)))
+    for row in report["correlations"]:
+        row["name_a"] = name(row["course_a"])
+        row["name_b"] = name(row["course_b"])
+    report["generated_at"] = datetime.now(timezone.utc).isoformat(
+        timespec="seconds")
+    return report
+
+@job_handler("grade_report")
+def grade_report_job(job):
+    import analytics
+    report = _build_grade_report(analytics)
+    # only the newest report is ever served; drop the older copies
+    db.session.execute(
+        db.update(Job)
+        .where(Job.kind == "grade_report", Job.id < job.id,
+               Job.result.is_not(None))
+        .values(result=None)
+    )
+    return report
+
+def refresh_grade_report():
+    # queue a rebuild unless one is already queued or running; returns the
+    # pending job's id. The lock covers this process; two processes racing
+    # here at most build the report twice.
+    with _report_refresh:
+        pending = db.session.scalar(
+            db.select(Job.id)
+            .where(Job.kind == "grade_report",
+                   Job.status.in_(("queued", "running")))
+            .limit(1)
+        )
+        return pending or start_job("grade_report")
+
+def _load_report(job_id):
+    result = db.session.scalar(db.select(Job.result).where(Job.id == job_id))
+    return json.loads(result) if result else None
+
+def grade_report():
+    """(latest report or None, id of a pending rebuild or None).
+
+    None altogether when numpy isn't installed.
+    """
+    try:
+        import analytics        # noqa: F401 -- only the jobs use it
+    except ImportError:
+        return None
+    latest = db.session.execute(
+        db.select(Job.id, Job.finished_at)
+        .where(Job.kind == "grade_report", Job.status == "done",
+               Job.result.is_not(None))
+        .order_by(Job.id.desc())
+        .limit(1)
+    ).first()
+    stale_before = datetime.now(timezone.utc).replace(tzinfo=None) \
+        - timedelta(seconds=app.config["ANALYTICS_TTL"])
+    pending = None
+    if latest is None or latest.finished_at < stale_before:
+        pending = refresh_grade_report()
+    if latest is None:
+        return None, pending
+    return report_cache.get(latest.id, lambda: _load_report(latest.id)), \
+        pending
+
+@app.route("/admin/analytics")
+@login_required
+@admin_required
+def admin_analytics():
+    state = grade_report()
+    report, pending = state or (None, None)
+    return render_template("admin_analytics.html", available=bool(state),
+                           report=report, pending=pending,
+                           columns=ANALYTICS_COLUMNS)
+
+def _report_or_error():
+    # (report, None), or (None, error response) while there is none yet
+    state = grade_report()
+    if state is None:
+        return None, (jsonify(error="grade reports need numpy installed"),
+                      503)
+    report, pending = state
+    if report is None:
+        return None, (jsonify(status="building", job=pending), 503,
+                      {"Retry-After": "5"})
+    return report, None
+
+@app.route("/admin/analytics.json")
+@login_required
+@admin_required
+def admin_analytics_json():
+    report, error = _report_or_error()
+    return error or jsonify(report)
+
+@app.route("/admin/analytics/<any(courses, teachers, correlations):section>.csv")
+@login_required
+@admin_required
+def admin_analytics_csv(section):
+    report, error = _report_or_error()
+    if error:
+        return error
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, ANALYTICS_COLUMNS[section],
+                            extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(report[section])
+    return Response(
+        buf.getvalue(),
+        mimetype="text/csv",
+        headers={
+            "Content-Disposition": f"attachment; filename={section}.csv"
+        }
+    )
+
+# ─── Background jobs ────────────────────────────────────────────────────────
+job_runner = JobRunner(
+    app,
+    workers=app.config["JOB_WORKERS"],
+    poll=app.config["JOB_POLL_SECONDS"],
+    stale_after=app.config["JOB_STALE_SECONDS"]
+)
+
+@app.before_request
+def start_job_runner():
+    # the first request starts this process's workers, which also picks up
+    # jobs left queued by a previous run; a no-op after that
+    job_runner.start()
+
+def start_job(kind, /, **params):
+    created_by = current_user.id if current_user.is_authenticated else None
+    job_id = enqueue(kind, params, created_by)
+    job_runner.start()
+    job_runner.wake()
+    return job_id
+
+def close_courses(teacher_id):
+    # take a teacher's courses out of the catalog and stop enrollments in
+    # them ahead of a delete job; the caller commits
+    if db.session.execute(
+        db.update(Course)
+        .where(Course.teacher_id == teacher_id, Course.closed.is_(False))
+        .values(closed=True)
+    ).rowcount:
+        bump_version("catalog")
+
+def delete_in_batches(model, condition, batch, on_batch, returning=()):
+    # DELETE ... WHERE id IN (SELECT id ... LIMIT n) until nothing is left;
+    # on_batch(rows) gets the deleted rows' `returning` columns and commits,
+    # so each transaction and its locks stay short
+    while True:
+        deleted = db.session.execute(
+            db.delete(model).where(model.id.in_(
+                db.select(model.id).where(condition).limit(batch)
+            )).returning(model.id, *returning)
+        ).all()
+        if not deleted:
+            return
+        on_batch(deleted)
+
+@job_handler("delete_user")
+def delete_user_job(job, user_id):
+    role = db.session.scalar(db.select(User.role).where(User.id == user_id))
+    if role is None:
+        return {"user_id": user_id, "already_deleted": True}
+    close_courses(user_id)        # already done when queued from the admin
+    taught = db.select(Course.id).where(Course.teacher_id == user_id)
+    n_courses = db.session.scalar(
+        db.select(db.func.count()).select_from(taught.subquery())
+    )
+    in_taught = Enrollment.course_id.in_(taught)
+    total = db.session.scalar(
+        db.select(db.func.count(Enrollment.id)).where(in_taught)
+    ) + n_courses + 1
+    done = 0
+    job.progress(done, total, f"deleting {n_courses} course(s)")
+
+    # seats held as a student go back to their courses first
+    freed = release_student_seats(user_id)
+    gradestats.drop_grades(Enrollment.student_id == user_id)
+    db.session.execute(
+        db.delete(Enrollment).where(Enrollment.student_id == user_id)
+    )
+    db.session.execute(
+        db.delete(WaitlistEntry).where(WaitlistEntry.student_id == user_id)
+    )
+    for course_id in freed:
+        fill_from_waitlist(course_id)
+    job.progress(done)
+
+    def step(rows):
+        nonlocal done
+        # students keep their GPA totals; take these grades out of them
+        gradestats.apply_changes(removed=[row[1:] for row in rows])
+        done += len(rows)
+        job.progress(done, message=f"{done} of {total} rows deleted")
+
+    delete_in_batches(
+        Enrollment, in_taught, app.config["JOB_DELETE_BATCH"], step,
+        returning=(Enrollment.course_id, Enrollment.student_id,
+                   Enrollment.grade)
+    )
+    db.session.execute(
+        db.delete(WaitlistEntry).where(WaitlistEntry.course_id.in_(taught))
+    )
+    db.session.execute(
+        db.delete(CourseMeeting).where(CourseMeeting.course_id.in_(taught))
+    )
+    db.session.execute(db.delete(Course).where(Course.teacher_id == user_id))
+    if n_courses:
+        bump_version("catalog")
+    db.session.execute(db.delete(User).where(User.id == user_id))
+    bump_version("users")
+    job.progress(total, message="deleted")
+    user_cache.invalidate(user_id)
+    user_count_cache.clear()
+    return {"user_id": user_id, "courses": n_courses,
+            "rows": total - n_courses - 1}
+
+@job_handler("import")
+def import_job(job, kind, path, fmt, start_chunk=0):
+    # resumes after the last committed chunk if a previous attempt died;
+    # the checkpoint carries that attempt's counts and errors forward so
+    # the result covers the whole file
+    saved = job.checkpoint or {"chunks_committed": start_chunk,
+                               "imported": 0, "failed": 0, "errors": []}
+    chunk_size = app.config["IMPORT_CHUNK_SIZE"]
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = max(0, sum(1 for _ in f) - (fmt == "csv"))
+    chunks = math.ceil(rows / chunk_size)
+
+    def totals(report):
+        return {
+            "kind": kind,
+            "chunks_committed": report.chunks_committed,
+            "imported": saved["imported"] + report.imported,
+            "failed": saved["failed"] + report.failed,
+            "errors": (saved["errors"] + report.errors)[:MAX_IMPORT_ERRORS],
+        }
+
+    def on_chunk(report):
+        so_far = totals(report)
+        job.progress(report.chunks_committed, chunks,
+                     f"{so_far['imported']} imported, "
+                     f"{so_far['failed']} failed",
+                     checkpoint=so_far)
+
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        report = import_stream(
+            kind, stream, fmt,
+            chunk_size=chunk_size,
+            start_chunk=saved["chunks_committed"],
+            hash_workers=app.config["IMPORT_HASH_WORKERS"],
+            on_chunk=on_chunk
+        )
+    user_count_cache.clear()
+    imported_changed(kind)
+    os.remove(path)
+    return totals(report)
 
-    return render_template("teacher_course.html", course=course)
+@job_handler("reconcile_seats")
+def reconcile_seats_job(job):
+    return {"repaired": reconcile_seat_counts()}
+
+@job_handler("rebuild_schedule")
+def rebuild_schedule_job(job):
+    return {"unparsed": rebuild_course_meetings()}
+
+@job_handler("rebuild_grade_stats")
+def rebuild_grade_stats_job(job):
+    totals = gradestats.compute()
+    mismatches = gradestats.verify(totals)
+    courses, students = gradestats.rebuild(totals)
+    return {"courses": courses, "students": students,
+            "mismatches": len(mismatches), "examples": mismatches[:20]}
+
+# admin-startable recalculations, with their button labels
+RECALCULATIONS = {
+    "reconcile_seats": "Recount seat counters",
+    "rebuild_schedule": "Rebuild meeting times",
+    "rebuild_grade_stats": "Rebuild grade statistics",
+}
+
+@app.route("/admin/jobs", methods=["GET", "POST"])
+@login_required
+@admin_required
+def admin_jobs():
+    if request.method == "POST":
+        kind = request.form.get("kind")
+        if kind not in RECALCULATIONS:
+            abort(400)
+        job_id = start_job(kind)
+        flash(f"{RECALCULATIONS[kind]} queued (job #{job_id}).", "success")
+        return redirect(url_for("admin_jobs"))
+    jobs = db.session.scalars(
+        db.select(Job).order_by(Job.id.desc()).limit(50)
+    ).all()
+    return render_template("admin_jobs.html", jobs=jobs,
+                           recalculations=RECALCULATIONS)
+
+@app.route("/admin/jobs/<int:job_id>")
+@login_required
+@admin_required
+def admin_job(job_id):
+    job = db.get_or_404(Job, job_id)
+    return render_template("admin_job.html", job=job,
+                           result=json.loads(job.result) if job.result else None)
+
+@app.route("/admin/jobs/<int:job_id>.json")
+@login_required
+@admin_required
+def admin_job_status(job_id):
+    job = db.get_or_404(Job, job_id)
+    return jsonify(
+        id=job.id, kind=job.kind, status=job.status, done=job.done,
+        total=job.total, message=job.message, attempts=job.attempts,
+        result=json.loads(job.result) if job.result else None
+    )
 
 # ─── DB init helper ─────────────────────────────────────────────────────────
+def upgrade_db():
+    # bring a grades.db created by an older version up to the current schema
+    insp = db.inspect(db.engine)
+    user_cols = {c["name"]: c for c in insp.get_columns("users")}
+    if (db.engine.dialect.name != "sqlite"
+            and user_cols["password_hash"]["type"].length < 256):
+        # SQLite never enforced the old VARCHAR(128); servers do
+        db.session.execute(db.text(
+            "ALTER TABLE users ALTER COLUMN password_hash TYPE VARCHAR(256)"
+        ))
+    cols = {c["name"] for c in insp.get_columns("courses")}
+    if "enrolled_count" not in cols:
+        db.session.execute(db.text(
+            "ALTER TABLE courses "
+            "ADD COLUMN enrolled_count INTEGER NOT NULL DEFAULT 0"
+        ))
+    if "closed" not in cols:
+        db.session.execute(db.text(
+            "ALTER TABLE courses ADD COLUMN closed BOOLEAN NOT NULL DEFAULT FALSE"
+        ))
+    indexes = {i["name"] for i in insp.get_indexes("enrollments")}
+    if "ix_enrollments_student_course" not in indexes:
+        # older databases may hold duplicate enrollments; keep the first
+        first = (
+            db.select(db.func.min(Enrollment.id))
+            .group_by(Enrollment.student_id, Enrollment.course_id)
+        )
+        db.session.execute(
+            db.delete(Enrollment).where(Enrollment.id.not_in(first))
+        )
+    version_cols = {c["name"] for c in insp.get_columns("data_versions")}
+    if "changed_at" not in version_cols:
+        db.session.execute(db.text(
+            "ALTER TABLE data_versions ADD COLUMN changed_at TIMESTAMP"
+        ))
+    conn = db.session.connection()
+    for table in (User.__table__, Course.__table__, Enrollment.__table__):
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+    reconcile_seat_counts()
+    if not db.session.scalar(db.select(CourseMeeting.id).limit(1)):
+        rebuild_course_meetings()
+    if not db.session.scalar(db.select(CourseGradeStats.course_id).limit(1)):
+        gradestats.rebuild()
+    db.session.commit()
+
 def init_db():
     with app.app_context():
         db.create_all()
+        upgrade_db()
         if not User.query.filter_by(role="admin").first():
             a = User(username="admin", role="admin")
             a.set_password("adminpass")
             db.session.add(a)
             db.session.commit()
 
+@app.cli.command("upgrade-db")
+def upgrade_db_command():
+    """Add columns and indexes missing from an existing database."""
+    upgrade_db()
+    print("Database schema is up to date.")
+
+@app.cli.command("rebuild-schedule")
+def rebuild_schedule_command():
+    """Re-parse every Course.time into course_meetings."""
+    unparsed = rebuild_course_meetings()
+    db.session.commit()
+    print(f"Rebuilt meeting times; {unparsed} course(s) had no parseable time.")
+
+@app.cli.command("rebuild-grade-stats")
+@click.option("--check", is_flag=True,
+              help="Only compare; exit 1 if the stored totals are off.")
+def rebuild_grade_stats_command(check):
+    """Recompute course grade stats and GPAs, reporting any drift."""
+    totals = gradestats.compute()
+    mismatches = gradestats.verify(totals)
+    for line in mismatches[:50]:
+        print(line, file=sys.stderr)
+    if len(mismatches) > 50:
+        print(f"... and {len(mismatches) - 50} more", file=sys.stderr)
+    if check:
+        print(f"{len(mismatches)} mismatch(es) between stored and "
+              "recomputed grade stats.")
+        sys.exit(1 if mismatches else 0)
+    courses, students = gradestats.rebuild(totals)
+    db.session.commit()
+    print(f"Rebuilt grade stats for {courses} course(s) and "
+          f"{students} student(s); {len(mismatches)} had drifted.")
+
+@app.cli.command("import-data")
+@click.argument("kind", type=click.Choice(IMPORT_KINDS))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]),
+              help="Defaults to the file extension.")
+@click.option("--chunk-size", type=int, default=None)
+@click.option("--resume", is_flag=True,
+              help="Skip chunks committed by a previous, interrupted run.")
+def import_data_command(kind, path, fmt, chunk_size, resume):
+    """Stream users, courses or enrollments from a CSV/JSONL file."""
+    fmt = fmt or ("jsonl" if path.lower().endswith(".jsonl") else "csv")
+    checkpoint = path + ".progress"
+    start = 0
+    if resume and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            start = json.load(f)["chunks_committed"]
+        print(f"Resuming after chunk {start}.")
+
+    def save_progress(report):
+        with open(checkpoint, "w") as f:
+            json.dump({"chunks_committed": report.chunks_committed}, f)
+        print(f"  chunk {report.chunks_committed}: "
+              f"{report.imported} imported, {report.failed} failed")
+
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        report = import_stream(
+            kind, stream, fmt,
+            chunk_size=chunk_size or app.config["IMPORT_CHUNK_SIZE"],
+            start_chunk=start,
+            hash_workers=app.config["IMPORT_HASH_WORKERS"],
+            on_chunk=save_progress
+        )
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    imported_changed(kind)
+    for row, message in report.errors:
+        print(f"row {row}: {message}", file=sys.stderr)
+    print(f"Imported {report.imported} {kind}, {report.failed} failed.")
+
+@app.cli.command("run-jobs")
+@click.option("--once", is_flag=True, help="Exit when the queue is empty.")
+def run_jobs_command(once):
+    """Run queued background jobs in this process."""
+    if once:
+        while job_runner.run_next():
+            pass
+        print("Job queue is empty.")
+        return
+    job_runner.start()
+    threading.Event().wait()
+
+@app.cli.command("reconcile-seats")
+def reconcile_seats_command():
+    """Recount Course.enrolled_count from the enrollments table."""
+    fixed = reconcile_seat_counts()
+    db.session.commit()
+    print(f"Repaired seat counts on {fixed} course(s).")
+
 if __name__ == "__main__":
     init_db()
     app.run(debug=True)
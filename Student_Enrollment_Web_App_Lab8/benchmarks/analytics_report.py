@@ -0,0 +1,71 @@
+"""Time the admin grade report on a large synthetic term.
+
+    python benchmarks/analytics_report.py                 # ~1M enrollments
+    python benchmarks/analytics_report.py --students 5000 --repeat 5
+
+Needs numpy. Seeds --students students taking --per-student of --courses
+courses each, grades every enrollment, then builds the report --repeat
+times and prints load (database -> arrays) and compute times.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import load_app, percentile, seed_university
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--per-student", type=int, default=20)
+    parser.add_argument("--courses", type=int, default=2000)
+    parser.add_argument("--teachers", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    url = args.database_url or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'analytics.db')}"
+    appmod = load_app(url)
+    import analytics
+    from models import Enrollment
+
+    start = time.perf_counter()
+    seed_university(appmod, students=args.students, teachers=args.teachers,
+                    courses=args.courses, per_student=args.per_student,
+                    capacity=args.students)
+    db = appmod.db
+    with appmod.app.app_context():
+        # deterministic spread of 40-100, a few points higher for some
+        # courses so the teacher comparison has something to find
+        db.session.execute(db.update(Enrollment).values(
+            grade=40 + (Enrollment.id * 7919 + Enrollment.student_id) % 55
+            + Enrollment.course_id % 7
+        ))
+        db.session.commit()
+        graded = db.session.scalar(db.select(db.func.count(Enrollment.id)))
+    print(f"seeded {graded} graded enrollments in "
+          f"{time.perf_counter() - start:.1f}s\n")
+
+    loads, computes, totals = [], [], []
+    with appmod.app.app_context():
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            report = analytics.build_report()
+            totals.append((time.perf_counter() - start) * 1000)
+            loads.append(report["timing"]["load_ms"])
+            computes.append(report["timing"]["compute_ms"])
+            db.session.rollback()
+
+    print(f"{'':<8} {'p50 ms':>8} {'max ms':>8}")
+    for name, samples in (("load", loads), ("compute", computes),
+                          ("total", totals)):
+        print(f"{name:<8} {percentile(samples, 50):>8.1f} "
+              f"{max(samples):>8.1f}")
+    print(f"\n{len(report['courses'])} courses, {len(report['teachers'])} "
+          f"teachers, {len(report['correlations'])} correlated pairs")
+
+
+if __name__ == "__main__":
+    main()
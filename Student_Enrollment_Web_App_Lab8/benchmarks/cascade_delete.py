@@ -0,0 +1,121 @@
+"""Time and memory of deleting a teacher through the ORM.
+
+    python benchmarks/cascade_delete.py --courses 50 --students 300
+    python benchmarks/cascade_delete.py --database-url postgresql://...
+
+Seeds teachers that each teach --courses courses with --students students
+in every one of them, then deletes them one at a time with
+db.session.delete():
+
+  traversal  the collections are loaded first, which is what the old
+             cascade="all, delete-orphan" did without passive_deletes:
+             every course and enrollment becomes an object and gets its
+             own DELETE
+  passive    the relationships as configured now: one DELETE for the
+             user, and the foreign keys cascade inside the database
+
+Each mode runs once for wall time and once under tracemalloc for peak
+Python memory, on separate teachers so every run deletes the same amount.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
+
+from common import load_app, seed_university
+
+
+def delete_teacher(appmod, teacher_id, traversal):
+    from models import User, Course
+
+    db = appmod.db
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    with appmod.app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count)
+        try:
+            start = time.perf_counter()
+            query = db.select(User).where(User.id == teacher_id)
+            if traversal:
+                query = query.options(
+                    selectinload(User.enrollments),
+                    selectinload(User.taught_courses)
+                    .selectinload(Course.enrollments)
+                )
+            user = db.session.scalars(query).one()
+            db.session.delete(user)
+            db.session.commit()
+            elapsed = time.perf_counter() - start
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count)
+    return elapsed, statements[0]
+
+
+def measure(appmod, teacher_id, traversal, traced):
+    if not traced:
+        return delete_teacher(appmod, teacher_id, traversal) + (None,)
+    tracemalloc.start()
+    try:
+        elapsed, statements = delete_teacher(appmod, teacher_id, traversal)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, statements, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--students", type=int, default=300)
+    args = parser.parse_args()
+
+    url = args.database_url or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cascade.db')}"
+    appmod = load_app(url)
+    from models import Course, Enrollment
+
+    # four teachers: {traversal, passive} x {timed, traced}
+    ids = seed_university(appmod, students=args.students, teachers=4,
+                          courses=4 * args.courses,
+                          per_student=4 * args.courses,
+                          capacity=args.students)
+    teachers = ids["teachers"]
+    db = appmod.db
+    with appmod.app.app_context():
+        rows = db.session.scalar(db.select(db.func.count(Enrollment.id)))
+    print(f"{len(teachers)} teachers x {args.courses} courses x "
+          f"{args.students} enrollments ({rows} enrollment rows)\n")
+
+    runs = [("traversal", True, False), ("passive", False, False),
+            ("traversal", True, True), ("passive", False, True)]
+    results = {}
+    for teacher_id, (name, traversal, traced) in zip(teachers, runs):
+        elapsed, statements, peak = measure(appmod, teacher_id, traversal,
+                                            traced)
+        entry = results.setdefault(name, {})
+        if traced:
+            entry["peak"] = peak
+        else:
+            entry["ms"], entry["statements"] = elapsed * 1000, statements
+
+    print(f"{'mode':<10} {'time ms':>9} {'statements':>11} {'peak MiB':>9}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['ms']:>9.1f} {r['statements']:>11} "
+              f"{r['peak'] / 2**20:>9.2f}")
+
+    with appmod.app.app_context():
+        left = db.session.scalar(db.select(db.func.count(Course.id)))
+        rows = db.session.scalar(db.select(db.func.count(Enrollment.id)))
+    print(f"\nleft behind: {left} course(s), {rows} enrollment(s)")
+
+
+if __name__ == "__main__":
+    main()
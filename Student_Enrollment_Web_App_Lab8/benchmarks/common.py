@@ -0,0 +1,100 @@
+"""Shared helpers for the benchmark scripts in this directory."""
+import os
+import random
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(db_url, **env):
+    # app.py reads its settings at import time, so the environment has to
+    # point at the scratch database before the import happens
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.update(env)
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    import app as appmod
+    # every simulated client shares 127.0.0.1, so login throttling is off
+    appmod.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False,
+                             RATELIMIT_ENABLED=False)
+    with appmod.app.app_context():
+        appmod.db.create_all()
+    return appmod
+
+
+def course_time(rng):
+    days = rng.choice(("MWF", "TR", "MW"))
+    hour = rng.randrange(8, 20)
+    return f"{days} {hour:02d}:00-{hour:02d}:50"
+
+
+def seed_university(appmod, students=1000, teachers=50, courses=200,
+                    per_student=4, capacity=60, password="benchpass",
+                    seed=1):
+    """Bulk-insert a synthetic term; returns the ids that were created."""
+    import passwords
+    from models import User, Course, Enrollment
+
+    db = appmod.db
+    rng = random.Random(seed)
+    pw_hash = passwords.hash_password(password)    # shared, hashed once
+    with appmod.app.app_context():
+        db.session.execute(db.insert(User), [
+            {"username": f"teacher{i}", "role": "teacher",
+             "password_hash": pw_hash}
+            for i in range(teachers)
+        ] + [
+            {"username": f"student{i}", "role": "student",
+             "password_hash": pw_hash}
+            for i in range(students)
+        ] + [
+            {"username": "admin", "role": "admin", "password_hash": pw_hash}
+        ])
+        teacher_ids = db.session.scalars(
+            db.select(User.id).where(User.role == "teacher")).all()
+        student_ids = db.session.scalars(
+            db.select(User.id).where(User.role == "student")).all()
+        admin_id = db.session.scalar(
+            db.select(User.id).where(User.role == "admin"))
+
+        db.session.execute(db.insert(Course), [
+            {"name": f"Course {i}", "time": course_time(rng),
+             "capacity": capacity, "teacher_id": teacher_ids[i % teachers]}
+            for i in range(courses)
+        ])
+        course_ids = db.session.scalars(db.select(Course.id)).all()
+
+        rows, taken = [], dict.fromkeys(course_ids, 0)
+        for sid in student_ids:
+            for cid in rng.sample(course_ids, min(per_student, courses)):
+                if taken[cid] < capacity:
+                    taken[cid] += 1
+                    rows.append({"student_id": sid, "course_id": cid})
+        if rows:
+            db.session.execute(db.insert(Enrollment), rows)
+        appmod.reconcile_seat_counts()
+        appmod.rebuild_course_meetings()
+        db.session.commit()
+    return {
+        "admin": admin_id,
+        "teachers": teacher_ids,
+        "students": student_ids,
+        "courses": course_ids,
+    }
+
+
+def client_for(appmod, user_id):
+    # a test client already logged in as user_id, skipping the password hash
+    client = appmod.app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+    return client
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
@@ -0,0 +1,95 @@
+"""Hammer one course with concurrent enrollments and check capacity holds.
+
+    python benchmarks/enroll_stress.py                      # temp SQLite file
+    python benchmarks/enroll_stress.py --database-url postgresql://...
+    python benchmarks/enroll_stress.py --postgres           # needs pgserver
+
+--postgres starts a throwaway local PostgreSQL through the optional
+`pgserver` package, so the server code path can be checked without a
+shared database.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from common import client_for, load_app, seed_university
+
+
+def local_postgres():
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("--postgres needs the pgserver package (pip install pgserver)")
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="bench-pg-"),
+                                 cleanup_mode="stop")
+    return server, server.get_uri()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--postgres", action="store_true")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--attempts", type=int, default=3)
+    parser.add_argument("--capacity", type=int, default=25)
+    args = parser.parse_args()
+
+    server = None
+    if args.postgres:
+        server, url = local_postgres()
+    elif args.database_url:
+        url = args.database_url
+    else:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+
+    appmod = load_app(url)
+    from models import Course, Enrollment
+
+    ids = seed_university(appmod, students=args.clients, teachers=1,
+                          courses=1, per_student=0, capacity=args.capacity)
+    course_id = ids["courses"][0]
+    barrier = threading.Barrier(args.clients)
+    failures = []
+
+    def student(student_id):
+        client = client_for(appmod, student_id)
+        barrier.wait()
+        for _ in range(args.attempts):
+            try:
+                status = client.get(f"/student/enroll/{course_id}").status_code
+            except Exception as exc:
+                failures.append(repr(exc))
+                continue
+            if status != 302:
+                failures.append(status)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=student, args=(sid,))
+               for sid in ids["students"]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    db = appmod.db
+    with appmod.app.app_context():
+        rows = db.session.scalar(db.select(db.func.count(Enrollment.id))
+                                 .where(Enrollment.course_id == course_id))
+        counter = db.session.get(Course, course_id).enrolled_count
+        dialect = db.engine.dialect.name
+    print(f"{dialect}: {args.clients} clients x "
+          f"{args.attempts} attempts in {elapsed:.2f}s -> {rows} enrolled "
+          f"(counter {counter}, capacity {args.capacity}), "
+          f"{len(failures)} failed requests")
+    if server is not None:
+        server.cleanup()
+    if rows != args.capacity or counter != rows or failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Measure login throughput per core at different password KDF costs.
+
+    python benchmarks/login_hashing.py --clients 8 --seconds 5 \\
+        --methods scrypt:16384:8:1 scrypt:32768:8:1 pbkdf2:sha256:600000
+
+Each method runs in its own process against a fresh temp database whose
+users were hashed with that method, so no login triggers a rehash. With
+--workers the size of the KDF pool can be varied as well (0 = hash on the
+request thread).
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from common import load_app, percentile, seed_university
+
+
+def run_method(method, workers, args, results):
+    tmp = tempfile.mkdtemp(prefix="bench-login-")
+    env = {"PASSWORD_HASH_METHOD": method}
+    if workers is not None:
+        env["PASSWORD_HASH_WORKERS"] = str(workers)
+    appmod = load_app(f"sqlite:///{os.path.join(tmp, 'bench.db')}", **env)
+    ids = seed_university(appmod, students=args.students, teachers=5,
+                          courses=20, per_student=1)
+
+    stop = time.perf_counter() + args.seconds
+    samples, failures = [], [0]
+    lock = threading.Lock()
+
+    def worker(seed):
+        client = appmod.app.test_client()
+        rng = random.Random(seed)
+        while time.perf_counter() < stop:
+            client.get("/logout")
+            start = time.perf_counter()
+            resp = client.post("/login", data={
+                "username": f"student{rng.randrange(len(ids['students']))}",
+                "password": "benchpass",
+            })
+            elapsed = time.perf_counter() - start
+            with lock:
+                if resp.status_code == 302:
+                    samples.append(elapsed)
+                else:
+                    failures[0] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,))
+               for i in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    cores = os.cpu_count() or 1
+    results[(method, workers)] = {
+        "logins_per_s": len(samples) / args.seconds,
+        "per_core": len(samples) / args.seconds / cores,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "failures": failures[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--methods", nargs="+", default=[
+        "scrypt:16384:8:1", "scrypt:32768:8:1", "pbkdf2:sha256:600000"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[None],
+                        help="KDF pool sizes to try (default: one per CPU)")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--students", type=int, default=200)
+    args = parser.parse_args()
+
+    # spawn: the hash settings are read when app.py is imported
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Manager().dict()
+    runs = [(m, w) for m in args.methods for w in args.workers]
+    for method, workers in runs:
+        p = ctx.Process(target=run_method,
+                        args=(method, workers, args, results))
+        p.start()
+        p.join()
+
+    print(f"{os.cpu_count()} CPU(s), {args.clients} clients")
+    print(f"{'method':<24}{'workers':>8}{'logins/s':>10}{'per core':>10}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'failed':>8}")
+    for method, workers in runs:
+        r = results[(method, workers)]
+        print(f"{method:<24}{'cpu' if workers is None else workers:>8}"
+              f"{r['logins_per_s']:>10.1f}{r['per_core']:>10.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['failures']:>8}")
+
+
+if __name__ == "__main__":
+    main()
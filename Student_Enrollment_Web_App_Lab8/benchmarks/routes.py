@@ -0,0 +1,215 @@
+"""Load-test the main routes against a seeded synthetic university.
+
+    python benchmarks/routes.py --students 5000 --courses 500 \\
+        --clients 8 --seconds 10 --out results.json
+    python benchmarks/routes.py --compare results.json   # diff vs a baseline
+
+Each scenario drives one route with --clients concurrent test clients for
+--seconds and records latency percentiles, throughput and SQL statements
+per request. Results are written as JSON keyed by scenario, together with
+the git commit and the parameters used.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+
+from sqlalchemy import event
+
+from common import client_for, load_app, percentile, seed_university
+
+SCENARIOS = ["login", "student_dashboard", "student_enroll",
+             "teacher_course_post", "admin_users"]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_request(name, appmod, ids, rosters, rng):
+    """Return a callable issuing one request of scenario `name`."""
+    if name == "login":
+        client = appmod.app.test_client()
+        def call():
+            client.get("/logout")
+            return client.post("/login", data={
+                "username": f"student{rng.randrange(len(ids['students']))}",
+                "password": "benchpass",
+            })
+        return call
+    if name == "student_dashboard":
+        client = client_for(appmod, rng.choice(ids["students"]))
+        return lambda: client.get("/student")
+    if name == "student_enroll":
+        client = client_for(appmod, rng.choice(ids["students"]))
+        return lambda: client.get(
+            f"/student/enroll/{rng.choice(ids['courses'])}")
+    if name == "teacher_course_post":
+        teacher_id, course_id = rng.choice(list(rosters))
+        client = client_for(appmod, teacher_id)
+        enrollment_ids = rosters[(teacher_id, course_id)]
+        return lambda: client.post(f"/teacher/course/{course_id}", data={
+            f"grade_{eid}": f"{rng.uniform(50, 100):.1f}"
+            for eid in enrollment_ids
+        })
+    if name == "admin_users":
+        client = client_for(appmod, ids["admin"])
+        top = max(ids["students"])
+        return lambda: client.get(f"/admin/users?after={rng.randrange(top)}")
+    raise ValueError(name)
+
+
+def run_scenario(name, appmod, ids, rosters, args):
+    local = threading.local()
+
+    def count(*_):
+        local.statements = getattr(local, "statements", 0) + 1
+
+    with appmod.app.app_context():
+        engine = appmod.db.engine
+    event.listen(engine, "before_cursor_execute", count)
+
+    latencies, statements, errors = [], [], [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.seconds
+
+    def client_loop(seed):
+        rng = random.Random(seed)
+        call = make_request(name, appmod, ids, rosters, rng)
+        while time.perf_counter() < stop:
+            local.statements = 0
+            start = time.perf_counter()
+            try:
+                ok = call().status_code < 500
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                    statements.append(local.statements)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client_loop, args=(i,))
+               for i in range(args.clients)]
+    began = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - began
+    event.remove(engine, "before_cursor_execute", count)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": len(latencies) / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "sql_per_request": (sum(statements) / len(statements)
+                            if statements else 0.0),
+        "sql_max": max(statements, default=0),
+    }
+
+
+def course_rosters(appmod):
+    from models import Course, Enrollment
+    db = appmod.db
+    rosters = {}
+    with appmod.app.app_context():
+        rows = db.session.execute(
+            db.select(Course.teacher_id, Course.id, Enrollment.id)
+            .join(Enrollment, Enrollment.course_id == Course.id)
+        ).all()
+    for teacher_id, course_id, enrollment_id in rows:
+        rosters.setdefault((teacher_id, course_id), []).append(enrollment_id)
+    return rosters
+
+
+def compare(baseline_path, results):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} (commit {baseline['meta']['commit']}):")
+    for name, now in results["routes"].items():
+        before = baseline["routes"].get(name)
+        if not before:
+            continue
+        print(f"  {name:<22}"
+              f"p95 {before['p95_ms']:8.1f} -> {now['p95_ms']:8.1f} ms   "
+              f"rps {before['throughput_rps']:8.1f} -> "
+              f"{now['throughput_rps']:8.1f}   "
+              f"sql {before['sql_per_request']:5.1f} -> "
+              f"{now['sql_per_request']:5.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url",
+                        help="defaults to a fresh SQLite file in a temp dir")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--teachers", type=int, default=50)
+    parser.add_argument("--courses", type=int, default=300)
+    parser.add_argument("--per-student", type=int, default=4)
+    parser.add_argument("--capacity", type=int, default=60)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS,
+                        choices=SCENARIOS)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON")
+    args = parser.parse_args()
+
+    url = args.database_url or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    appmod = load_app(url)
+    seeded = time.perf_counter()
+    ids = seed_university(appmod, students=args.students,
+                          teachers=args.teachers, courses=args.courses,
+                          per_student=args.per_student,
+                          capacity=args.capacity)
+    seeded = time.perf_counter() - seeded
+    rosters = course_rosters(appmod)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "database": url.split(":", 1)[0],
+            "seed_seconds": seeded,
+            "params": {k: v for k, v in vars(args).items()
+                       if k not in ("out", "compare", "database_url")},
+        },
+        "routes": {},
+    }
+    print(f"{'scenario':<22}{'reqs':>7}{'err':>5}{'rps':>9}{'p50':>8}"
+          f"{'p95':>8}{'p99':>8}{'sql/req':>9}")
+    for name in args.scenarios:
+        r = run_scenario(name, appmod, ids, rosters, args)
+        results["routes"][name] = r
+        print(f"{name:<22}{r['requests']:>7}{r['errors']:>5}"
+              f"{r['throughput_rps']:>9.1f}{r['p50_ms']:>8.1f}"
+              f"{r['p95_ms']:>8.1f}{r['p99_ms']:>8.1f}"
+              f"{r['sql_per_request']:>9.1f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {args.out}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
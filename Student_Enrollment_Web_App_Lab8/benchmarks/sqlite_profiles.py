@@ -0,0 +1,108 @@
+"""Compare read/write concurrency under each SQLite pragma profile.
+
+    python benchmarks/sqlite_profiles.py --readers 8 --writers 4 --seconds 5
+
+Each profile runs in its own process against a fresh temp database:
+readers load /student while writers enroll and unenroll at random.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from common import client_for, load_app, percentile, seed_university
+
+
+def run_profile(profile, args, results):
+    tmp = tempfile.mkdtemp(prefix=f"bench-{profile}-")
+    appmod = load_app(f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                      SQLITE_PROFILE=profile)
+    ids = seed_university(appmod, students=args.students,
+                          courses=args.courses, capacity=args.capacity)
+
+    stop = time.perf_counter() + args.seconds
+    stats = {"read": [], "write": [], "errors": 0}
+    lock = threading.Lock()
+
+    def worker(kind, student_id):
+        client = client_for(appmod, student_id)
+        rng = random.Random(student_id)
+        while time.perf_counter() < stop:
+            if kind == "read":
+                url = "/student"
+            else:
+                action = rng.choice(("enroll", "unenroll"))
+                url = f"/student/{action}/{rng.choice(ids['courses'])}"
+            start = time.perf_counter()
+            try:
+                ok = client.get(url).status_code < 500
+            except Exception:    # "database is locked" propagates in TESTING
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    stats[kind].append(elapsed)
+                else:
+                    stats["errors"] += 1
+
+    students = ids["students"]
+    threads = [
+        threading.Thread(target=worker, args=("read", students[i]))
+        for i in range(args.readers)
+    ] + [
+        threading.Thread(target=worker, args=("write", students[-1 - i]))
+        for i in range(args.writers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    summary = {
+        kind: {
+            "ops_per_s": len(stats[kind]) / args.seconds,
+            "p50_ms": percentile(stats[kind], 50) * 1000,
+            "p99_ms": percentile(stats[kind], 99) * 1000,
+        }
+        for kind in ("read", "write")
+    }
+    summary["errors"] = stats["errors"]
+    results[profile] = summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="+",
+                        default=["classic", "production"])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--courses", type=int, default=300)
+    parser.add_argument("--capacity", type=int, default=60)
+    args = parser.parse_args()
+
+    # spawn: app.py binds its engine at import, so every profile needs a
+    # fresh interpreter
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Manager().dict()
+    for profile in args.profiles:
+        p = ctx.Process(target=run_profile, args=(profile, args, results))
+        p.start()
+        p.join()
+
+    print(f"{'profile':<12}{'kind':<7}{'ops/s':>9}{'p50 ms':>9}"
+          f"{'p99 ms':>9}{'errors':>8}")
+    for profile in args.profiles:
+        r = results[profile]
+        for kind in ("read", "write"):
+            print(f"{profile:<12}{kind:<7}{r[kind]['ops_per_s']:>9.1f}"
+                  f"{r[kind]['p50_ms']:>9.1f}{r[kind]['p99_ms']:>9.1f}"
+                  f"{r['errors'] if kind == 'read' else '':>8}")
+
+
+if __name__ == "__main__":
+    main()
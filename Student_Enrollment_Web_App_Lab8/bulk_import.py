@@ -0,0 +1,279 @@
+# bulk_import.py
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+import passwords
+from models import db, User, Course, Enrollment, CourseMeeting
+from schedule import parse_meetings
+
+ROLES = ("student", "teacher", "admin")
+KINDS = ("users", "courses", "enrollments")
+MAX_ERRORS_KEPT = 1000
+# below this many passwords in a chunk a process pool costs more than it saves
+POOL_MIN_PASSWORDS = 64
+
+# Expected columns (CSV header or JSONL keys):
+#   users:       username, role, password
+#   courses:     name, time, capacity, teacher   (teacher = username)
+#   enrollments: student, course_id[, grade]     (student = username)
+
+
+class ImportReport:
+    def __init__(self, kind, start_chunk=0):
+        self.kind = kind
+        self.imported = 0
+        self.failed = 0
+        self.errors = []                  # (row number, message), capped
+        self.chunks_committed = start_chunk
+
+    def error(self, row, message):
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS_KEPT:
+            self.errors.append((row, message))
+
+    def as_dict(self):
+        return {
+            "kind": self.kind,
+            "imported": self.imported,
+            "failed": self.failed,
+            "chunks_committed": self.chunks_committed,
+            "errors": self.errors,
+        }
+
+
+def read_records(stream, fmt):
+    # yields (row number, dict or None) without reading the whole file
+    if fmt == "csv":
+        for n, row in enumerate(csv.DictReader(stream), 1):
+            yield n, row
+    elif fmt == "jsonl":
+        for n, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield n, json.loads(line)
+            except ValueError:
+                yield n, None
+    else:
+        raise ValueError(f"unknown format {fmt!r}")
+
+
+def _chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _text(rec, key):
+    value = rec.get(key)
+    return "" if value is None else str(value).strip()
+
+
+def _hash_passwords(plain, pool_holder, workers):
+    hasher = partial(generate_password_hash,
+                     method=passwords.current_method())
+    if len(plain) < POOL_MIN_PASSWORDS:
+        return [hasher(pw) for pw in plain]
+    if pool_holder[0] is None:
+        pool_holder[0] = ProcessPoolExecutor(workers)
+    per_worker = max(1, len(plain) // (4 * (workers or 4)))
+    return list(pool_holder[0].map(hasher, plain, chunksize=per_worker))
+
+
+def _import_users(chunk, report, pool_holder, workers):
+    names = [_text(r, "username") for _, r in chunk if isinstance(r, dict)]
+    taken = set(db.session.scalars(
+        db.select(User.username).where(User.username.in_(names))
+    ))
+    valid = []
+    for row, rec in chunk:
+        if not isinstance(rec, dict):
+            report.error(row, "not a valid record")
+            continue
+        username, role = _text(rec, "username"), _text(rec, "role").lower()
+        password = _text(rec, "password")
+        if not 3 <= len(username) <= 50:
+            report.error(row, "username must be 3-50 characters")
+        elif role not in ROLES:
+            report.error(row, f"role must be one of {', '.join(ROLES)}")
+        elif len(password) < 6:
+            report.error(row, "password must be at least 6 characters")
+        elif username in taken:
+            report.error(row, f"username {username!r} already exists")
+        else:
+            taken.add(username)
+            valid.append((username, role, password))
+    if not valid:
+        return 0
+    hashes = _hash_passwords([v[2] for v in valid], pool_holder, workers)
+    db.session.execute(db.insert(User), [
+        {"username": u, "role": r, "password_hash": h}
+        for (u, r, _), h in zip(valid, hashes)
+    ])
+    return len(valid)
+
+
+def _import_courses(chunk, report, pool_holder, workers):
+    names = [_text(r, "teacher") for _, r in chunk if isinstance(r, dict)]
+    teachers = dict(db.session.execute(
+        db.select(User.username, User.id)
+        .where(User.username.in_(names), User.role == "teacher")
+    ).all())
+    valid = []
+    for row, rec in chunk:
+        if not isinstance(rec, dict):
+            report.error(row, "not a valid record")
+            continue
+        name, time = _text(rec, "name"), _text(rec, "time")
+        teacher = _text(rec, "teacher")
+        try:
+            capacity = int(_text(rec, "capacity"))
+        except ValueError:
+            capacity = 0
+        if not name or len(name) > 120:
+            report.error(row, "name must be 1-120 characters")
+        elif not time or len(time) > 120:
+            report.error(row, "time must be 1-120 characters")
+        elif capacity < 1:
+            report.error(row, "capacity must be a positive integer")
+        elif teacher not in teachers:
+            report.error(row, f"no teacher named {teacher!r}")
+        else:
+            valid.append({"name": name, "time": time, "capacity": capacity,
+                          "teacher_id": teachers[teacher]})
+    if not valid:
+        return 0
+    created = db.session.execute(
+        db.insert(Course).returning(Course.id, Course.time), valid
+    ).all()
+    meetings = [
+        {"course_id": cid, "day": d, "start_min": s, "end_min": e}
+        for cid, time in created
+        for d, s, e in parse_meetings(time)
+    ]
+    if meetings:
+        db.session.execute(db.insert(CourseMeeting), meetings)
+    return len(valid)
+
+
+def _import_enrollments(chunk, report, pool_holder, workers):
+    recs = [r for _, r in chunk if isinstance(r, dict)]
+    students = dict(db.session.execute(
+        db.select(User.username, User.id).where(
+            User.username.in_([_text(r, "student") for r in recs]),
+            User.role == "student"
+        )
+    ).all())
+    course_ids = set()
+    for r in recs:
+        try:
+            course_ids.add(int(_text(r, "course_id")))
+        except ValueError:
+            pass
+    free = {
+        cid: cap - used for cid, cap, used in db.session.execute(
+            db.select(Course.id, Course.capacity, Course.enrolled_count)
+            .where(Course.id.in_(course_ids))
+        )
+    }
+    existing = set(db.session.execute(
+        db.select(Enrollment.student_id, Enrollment.course_id).where(
+            Enrollment.student_id.in_(students.values()),
+            Enrollment.course_id.in_(course_ids)
+        )
+    ).all())
+
+    valid, added = [], {}
+    for row, rec in chunk:
+        if not isinstance(rec, dict):
+            report.error(row, "not a valid record")
+            continue
+        student = _text(rec, "student")
+        raw_grade = _text(rec, "grade")
+        try:
+            course_id = int(_text(rec, "course_id"))
+        except ValueError:
+            course_id = None
+        try:
+            grade = float(raw_grade) if raw_grade else None
+        except ValueError:
+            grade = float("nan")
+        if student not in students:
+            report.error(row, f"no student named {student!r}")
+        elif course_id not in free:
+            report.error(row, "no such course")
+        elif grade is not None and not 0 <= grade < float("inf"):
+            report.error(row, f"{raw_grade!r} is not a valid grade")
+        elif (students[student], course_id) in existing:
+            report.error(row, "already enrolled")
+        elif free[course_id] <= 0:
+            report.error(row, "course is full")
+        else:
+            existing.add((students[student], course_id))
+            free[course_id] -= 1
+            added[course_id] = added.get(course_id, 0) + 1
+            valid.append({"student_id": students[student],
+                          "course_id": course_id, "grade": grade})
+    if not valid:
+        return 0
+    db.session.execute(db.insert(Enrollment), valid)
+    courses = Course.__table__
+    db.session.execute(
+        courses.update()
+        .where(courses.c.id == db.bindparam("cid"))
+        .values(enrolled_count=courses.c.enrolled_count + db.bindparam("n")),
+        [{"cid": cid, "n": n} for cid, n in added.items()]
+    )
+    return len(valid)
+
+
+IMPORTERS = {
+    "users": _import_users,
+    "courses": _import_courses,
+    "enrollments": _import_enrollments,
+}
+
+
+def import_stream(kind, stream, fmt, chunk_size=1000, start_chunk=0,
+                  hash_workers=None, on_chunk=None):
+    """Import `stream` chunk by chunk, committing after each chunk.
+
+    Chunks before `start_chunk` are skipped, so an interrupted import is
+    resumed by passing the previous report's chunks_committed. Bad rows
+    are reported and skipped; they never abort the file.
+    """
+    importer = IMPORTERS[kind]
+    report = ImportReport(kind, start_chunk)
+    pool_holder = [None]
+    try:
+        for n, chunk in enumerate(_chunks(read_records(stream, fmt),
+                                          chunk_size)):
+            if n < start_chunk:
+                continue
+            failed, kept = report.failed, len(report.errors)
+            try:
+                report.imported += importer(chunk, report, pool_holder,
+                                            hash_workers)
+                db.session.commit()
+            except IntegrityError as exc:
+                # lost a race with a concurrent writer; skip the chunk
+                db.session.rollback()
+                report.failed, report.errors[kept:] = failed, []
+                for row, _ in chunk:
+                    report.error(row, f"chunk rejected: {exc.orig}")
+            report.chunks_committed = n + 1
+            if on_chunk:
+                on_chunk(report)
+    finally:
+        if pool_holder[0] is not None:
+            pool_holder[0].shutdown()
+    return report
@@ -1,7 +1,10 @@
 # forms.py
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SelectField, SubmitField
-from wtforms.validators import DataRequired, Length
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import (
+    StringField, PasswordField, SelectField, SubmitField, IntegerField
+)
+from wtforms.validators import DataRequired, Length, NumberRange, Optional
 
 class LoginForm(FlaskForm):
     username = StringField(
@@ -35,4 +38,26 @@ class AdminUserForm(FlaskForm):
         description="(leave blank to keep current password)"
     )
     submit = SubmitField("Save")
-    
\ No newline at end of file
+    
+
+class ImportForm(FlaskForm):
+    kind = SelectField(
+        "Import",
+        choices=[
+            ("users", "Users"),
+            ("courses", "Courses"),
+            ("enrollments", "Enrollments")
+        ],
+        validators=[DataRequired()]
+    )
+    file = FileField(
+        "File (.csv or .jsonl)",
+        validators=[FileRequired(), FileAllowed(["csv", "jsonl"])]
+    )
+    # to resume an interrupted import, skip the chunks already committed
+    start_chunk = IntegerField(
+        "Start at chunk",
+        default=0,
+        validators=[Optional(), NumberRange(min=0)]
+    )
+    submit = SubmitField("Import")
@@ -0,0 +1,40 @@
+# fragments.py
+import re
+
+from markupsafe import Markup
+
+# a cached fragment marks each per-viewer slot as <!--slot:KEY-->...<!--/slot-->
+_SLOT = re.compile(r"<!--slot:(\w+)-->(.*?)<!--/slot-->", re.S)
+
+
+def split_slots(html):
+    """Strip the slot markers; return (html, {key: (start, end)})."""
+    out, spans, pos, length = [], {}, 0, 0
+    for m in _SLOT.finditer(html):
+        before, default = html[pos:m.start()], m.group(2)
+        out += (before, default)
+        start = length + len(before)
+        length = start + len(default)
+        spans[m.group(1)] = (start, length)
+        pos = m.end()
+    out.append(html[pos:])
+    return "".join(out), spans
+
+
+def fill_slots(fragment, overrides):
+    """Splice per-viewer markup into a split fragment.
+
+    Only the overridden slots are touched, so the Python work grows with
+    len(overrides), not with the size of the fragment.
+    """
+    html, spans = fragment
+    edits = sorted(
+        (spans[key], value) for key, value in overrides.items()
+        if key in spans
+    )
+    pieces, pos = [], 0
+    for (start, end), value in edits:
+        pieces += (html[pos:start], value)
+        pos = end
+    pieces.append(html[pos:])
+    return Markup("".join(pieces))
@@ -0,0 +1,234 @@
+# gradestats.py
+import math
+from collections import Counter, namedtuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import (
+    db, Enrollment, CourseGradeStats, GradeBucket, StudentGradeStats
+)
+
+# Grades are stored as plain numbers (percentages). The histogram has
+# BUCKETS bins of BUCKET_WIDTH points, the last one also holding anything
+# above 100; GPA points use the usual letter-grade cut-offs. Changing
+# either means running `flask rebuild-grade-stats`.
+BUCKET_WIDTH = 10
+BUCKETS = 11
+GRADE_POINTS = ((90, 4.0), (80, 3.0), (70, 2.0), (60, 1.0))
+
+CourseStats = namedtuple("CourseStats", "graded mean variance histogram")
+StudentStats = namedtuple("StudentStats", "graded average gpa")
+
+# totals that went through enough additions and removals to drift by more
+# than this are reported by verify()
+TOLERANCE = 1e-6
+
+
+def bucket(grade):
+    return min(int(grade // BUCKET_WIDTH), BUCKETS - 1)
+
+
+def grade_points(grade):
+    for cutoff, points in GRADE_POINTS:
+        if grade >= cutoff:
+            return points
+    return 0.0
+
+
+def bucket_label(n):
+    low = n * BUCKET_WIDTH
+    return f"{low}+" if n == BUCKETS - 1 else f"{low}-{low + BUCKET_WIDTH - 1}"
+
+
+# ─── Totals ──────────────────────────────────────────────────────────────────
+class _Totals:
+    def __init__(self):
+        self.courses = {}           # course id -> [graded, sum, sum of squares]
+        self.buckets = Counter()    # (course id, bucket) -> count
+        self.students = {}          # student id -> [graded, sum, points]
+
+    def add(self, rows, sign=1):
+        # rows of (course_id, student_id, grade); ungraded rows don't count
+        for course_id, student_id, grade in rows:
+            if grade is None:
+                continue
+            c = self.courses.setdefault(course_id, [0, 0.0, 0.0])
+            c[0] += sign
+            c[1] += sign * grade
+            c[2] += sign * grade * grade
+            self.buckets[course_id, bucket(grade)] += sign
+            s = self.students.setdefault(student_id, [0, 0.0, 0.0])
+            s[0] += sign
+            s[1] += sign * grade
+            s[2] += sign * grade_points(grade)
+
+    def course_rows(self):
+        return [{"course_id": cid, "graded": n, "grade_sum": total,
+                 "grade_sq": sq}
+                for cid, (n, total, sq) in self.courses.items()]
+
+    def bucket_rows(self):
+        return [{"course_id": cid, "bucket": b, "count": n}
+                for (cid, b), n in self.buckets.items()]
+
+    def student_rows(self):
+        return [{"student_id": sid, "graded": n, "grade_sum": total,
+                 "points_sum": points}
+                for sid, (n, total, points) in self.students.items()]
+
+
+def _upsert_add(model, rows):
+    # INSERT .. ON CONFLICT DO UPDATE SET col = col + excluded.col: adds the
+    # deltas atomically, creating rows the first time a course or student
+    # gets a grade. Both supported databases spell it the same way.
+    if not rows:
+        return
+    table = model.__table__
+    dialect = postgresql if db.engine.dialect.name == "postgresql" else sqlite
+    insert = dialect.insert(table)
+    keys = [c.name for c in table.primary_key]
+    stmt = insert.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: table.c[name] + insert.excluded[name]
+              for name in rows[0] if name not in keys}
+    )
+    db.session.execute(stmt, rows)
+
+
+def apply_changes(removed=(), added=()):
+    """Move the stored totals by grades that left and grades that arrived.
+
+    Both are iterables of (course_id, student_id, grade) rows; a changed
+    grade is its old row removed plus its new row added. Runs in the
+    caller's transaction, so the totals commit together with the grades.
+    """
+    totals = _Totals()
+    totals.add(removed, -1)
+    totals.add(added, +1)
+    _upsert_add(CourseGradeStats, totals.course_rows())
+    _upsert_add(GradeBucket, [r for r in totals.bucket_rows() if r["count"]])
+    _upsert_add(StudentGradeStats, totals.student_rows())
+
+
+def drop_grades(condition):
+    # call before deleting the enrollments matching `condition`
+    apply_changes(removed=db.session.execute(
+        db.select(Enrollment.course_id, Enrollment.student_id,
+                  Enrollment.grade)
+        .where(condition, Enrollment.grade.is_not(None))
+    ))
+
+
+# ─── Reads ───────────────────────────────────────────────────────────────────
+def course_stats(course_ids):
+    """{course id: CourseStats} for the given courses that have grades."""
+    course_ids = list(course_ids)
+    if not course_ids:
+        return {}
+    histograms = {}
+    for course_id, b, n in db.session.execute(
+        db.select(GradeBucket.course_id, GradeBucket.bucket, GradeBucket.count)
+        .where(GradeBucket.course_id.in_(course_ids))
+    ):
+        histograms.setdefault(course_id, [0] * BUCKETS)[b] = n
+    stats = {}
+    for course_id, n, total, sq in db.session.execute(
+        db.select(CourseGradeStats.course_id, CourseGradeStats.graded,
+                  CourseGradeStats.grade_sum, CourseGradeStats.grade_sq)
+        .where(CourseGradeStats.course_id.in_(course_ids),
+               CourseGradeStats.graded > 0)
+    ):
+        mean = total / n
+        stats[course_id] = CourseStats(
+            n, mean, max(0.0, sq / n - mean * mean),
+            histograms.get(course_id, [0] * BUCKETS)
+        )
+    return stats
+
+
+def student_stats(student_id):
+    row = db.session.execute(
+        db.select(StudentGradeStats.graded, StudentGradeStats.grade_sum,
+                  StudentGradeStats.points_sum)
+        .where(StudentGradeStats.student_id == student_id,
+               StudentGradeStats.graded > 0)
+    ).first()
+    if row is None:
+        return None
+    n, total, points = row
+    return StudentStats(n, total / n, points / n)
+
+
+# ─── Rebuild / verify ────────────────────────────────────────────────────────
+def compute():
+    """Totals recomputed from every graded enrollment."""
+    totals = _Totals()
+    totals.add(db.session.execute(
+        db.select(Enrollment.course_id, Enrollment.student_id,
+                  Enrollment.grade)
+        .where(Enrollment.grade.is_not(None))
+        .execution_options(yield_per=10_000)
+    ))
+    return totals
+
+
+def _stored():
+    totals = _Totals()
+    for cid, n, total, sq in db.session.execute(
+        db.select(CourseGradeStats.course_id, CourseGradeStats.graded,
+                  CourseGradeStats.grade_sum, CourseGradeStats.grade_sq)
+    ):
+        totals.courses[cid] = [n, total, sq]
+    for cid, b, n in db.session.execute(
+        db.select(GradeBucket.course_id, GradeBucket.bucket, GradeBucket.count)
+    ):
+        totals.buckets[cid, b] = n
+    for sid, n, total, points in db.session.execute(
+        db.select(StudentGradeStats.student_id, StudentGradeStats.graded,
+                  StudentGradeStats.grade_sum, StudentGradeStats.points_sum)
+    ):
+        totals.students[sid] = [n, total, points]
+    return totals
+
+
+def _differs(a, b):
+    return any(not math.isclose(x, y, rel_tol=TOLERANCE, abs_tol=TOLERANCE)
+               for x, y in zip(a, b))
+
+
+def verify(expected=None):
+    """Compare the stored totals with a fresh computation.
+
+    Returns a list of human-readable mismatches; empty when they agree.
+    Rows whose counts are all zero are the same as missing rows.
+    """
+    expected = expected or compute()
+    stored = _stored()
+    problems = []
+    for label, want, have, zero in (
+        ("course", expected.courses, stored.courses, [0, 0.0, 0.0]),
+        ("student", expected.students, stored.students, [0, 0.0, 0.0]),
+    ):
+        for key in sorted(want.keys() | have.keys()):
+            a, b = want.get(key, zero), have.get(key, zero)
+            if _differs(a, b):
+                problems.append(f"{label} {key}: expected {a}, stored {b}")
+    for key in sorted(expected.buckets.keys() | stored.buckets.keys()):
+        a, b = expected.buckets.get(key, 0), stored.buckets.get(key, 0)
+        if a != b:
+            problems.append(f"course {key[0]} bucket {bucket_label(key[1])}: "
+                            f"expected {a}, stored {b}")
+    return problems
+
+
+def rebuild(totals=None):
+    """Replace all stored totals with a fresh computation (no commit)."""
+    totals = totals or compute()
+    for model in (GradeBucket, CourseGradeStats, StudentGradeStats):
+        db.session.execute(db.delete(model))
+    for model, rows in ((CourseGradeStats, totals.course_rows()),
+                        (GradeBucket, totals.bucket_rows()),
+                        (StudentGradeStats, totals.student_rows())):
+        if rows:
+            db.session.execute(db.insert(model), rows)
+    return len(totals.courses), len(totals.students)
@@ -0,0 +1,179 @@
+# jobs.py
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from models import db, Job
+
+log = logging.getLogger(__name__)
+
+# kind -> handler(job, **params); handlers register with @job_handler
+HANDLERS = {}
+
+
+def job_handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue(kind, params=None, created_by=None):
+    """Persist a queued job and return its id (commits)."""
+    if kind not in HANDLERS:
+        raise ValueError(f"unknown job kind: {kind}")
+    job = Job(kind=kind, params=json.dumps(params or {}),
+              created_by=created_by)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+class JobContext:
+    """Handed to a handler: its saved checkpoint and a progress() call."""
+
+    def __init__(self, job_id, checkpoint):
+        self.id = job_id
+        self.checkpoint = checkpoint      # None on the first attempt
+
+    def progress(self, done, total=None, message=None, checkpoint=None):
+        # commits whatever the handler has pending together with the
+        # progress, so a saved checkpoint never runs ahead of the data
+        values = {"done": done, "heartbeat_at": _utcnow()}
+        if total is not None:
+            values["total"] = total
+        if message is not None:
+            values["message"] = message[:500]
+        if checkpoint is not None:
+            values["checkpoint"] = json.dumps(checkpoint)
+            self.checkpoint = checkpoint
+        db.session.execute(
+            db.update(Job).where(Job.id == self.id).values(**values)
+        )
+        db.session.commit()
+
+
+class JobRunner:
+    """Runs queued jobs on `workers` daemon threads in this process.
+
+    Jobs are claimed with a guarded UPDATE, so several processes can run
+    runners against one database without taking the same job. A running
+    job whose heartbeat is older than `stale_after` seconds belonged to a
+    process that died; it is queued again (handlers resume from their
+    checkpoint) until it has been attempted `max_attempts` times.
+    """
+
+    def __init__(self, app, workers=1, poll=5.0, stale_after=300,
+                 max_attempts=3):
+        self.app = app
+        self.workers = workers
+        self.poll = poll
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._loop, daemon=True,
+                                     name=f"jobs-{len(self._threads)}")
+                self._threads.append(t)
+                t.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            try:
+                ran = self.run_next()
+            except Exception:
+                log.exception("job runner error")
+                ran = False
+            if not ran:
+                self._wake.wait(self.poll)
+                self._wake.clear()
+
+    def run_next(self):
+        """Claim and run one job; False if the queue was empty."""
+        with self.app.app_context():
+            job_id = self._claim()
+            if job_id is None:
+                return False
+            self._execute(job_id)
+            return True
+
+    def _recover_stale(self, now):
+        cutoff = now - timedelta(seconds=self.stale_after)
+        stale = db.and_(Job.status == "running", Job.heartbeat_at < cutoff)
+        db.session.execute(
+            db.update(Job)
+            .where(stale, Job.attempts >= self.max_attempts)
+            .values(status="failed", finished_at=now,
+                    message="interrupted too many times")
+        )
+        db.session.execute(
+            db.update(Job).where(stale).values(status="queued")
+        )
+
+    def _claim(self):
+        now = _utcnow()
+        self._recover_stale(now)
+        db.session.commit()
+        while True:
+            job_id = db.session.scalar(
+                db.select(Job.id).where(Job.status == "queued")
+                .order_by(Job.id).limit(1)
+            )
+            if job_id is None:
+                db.session.commit()
+                return None
+            claimed = db.session.execute(
+                db.update(Job)
+                .where(Job.id == job_id, Job.status == "queued")
+                .values(status="running", started_at=now, heartbeat_at=now,
+                        attempts=Job.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return job_id
+
+    def _execute(self, job_id):
+        job = db.session.get(Job, job_id)
+        kind, params = job.kind, json.loads(job.params)
+        ctx = JobContext(
+            job.id, json.loads(job.checkpoint) if job.checkpoint else None
+        )
+        db.session.commit()
+        try:
+            if kind not in HANDLERS:
+                raise LookupError(f"no handler for job kind {kind!r}")
+            result = HANDLERS[kind](ctx, **params)
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            log.exception("job %s (%s) failed", job_id, kind)
+            self._finish(job_id, "failed",
+                         message=f"{type(exc).__name__}: {exc}")
+        else:
+            self._finish(job_id, "done", result=result)
+
+    def _finish(self, job_id, status, result=None, message=None):
+        values = {"status": status, "finished_at": _utcnow()}
+        if result is not None:
+            values["result"] = json.dumps(result)
+        if message is not None:
+            values["message"] = message[:500]
+        db.session.execute(
+            db.update(Job).where(Job.id == job_id).values(**values)
+        )
+        db.session.commit()
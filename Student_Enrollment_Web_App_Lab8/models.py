@@ -1,33 +1,62 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, verify_password
 
 db = SQLAlchemy()
 
 class User(db.Model, UserMixin):
     __tablename__ = "users"
+    __table_args__ = (
+        # role filter + keyset order in the admin user list
+        db.Index("ix_users_role_id", "role", "id"),
+        # username prefix search on PostgreSQL: LIKE 'abc%' can only use an
+        # index that compares bytewise, whatever the database's collation
+        db.Index(
+            "ix_users_username_pattern", "username",
+            postgresql_ops={"username": "text_pattern_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
     id            = db.Column(db.Integer,   primary_key=True)
     username      = db.Column(db.String(50), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)  # scrypt ~160 chars
     role          = db.Column(db.String(10), nullable=False)
 
+    # passive_deletes: the ondelete="CASCADE" foreign keys remove the rows,
+    # so deleting a user doesn't load every course and enrollment first
     enrollments    = db.relationship(
         "Enrollment",
         back_populates="student",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
     taught_courses = db.relationship(
         "Course",
         back_populates="teacher",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     # helpers --------------------------------------------------------------
     def set_password(self, pw):
-        self.password_hash = generate_password_hash(pw)
+        self.password_hash = hash_password(pw)
 
     def check_password(self, pw):
-        return check_password_hash(self.password_hash, pw)
+        return verify_password(self.password_hash, pw)
+
+    def principal(self):
+        return UserPrincipal(self.id, self.username, self.role)
+
+
+class UserPrincipal(UserMixin):
+    # detached stand-in for User that Flask-Login keeps as current_user;
+    # carries only the fields request handlers read, so it can be cached
+    # across requests without holding a session
+    __slots__ = ("id", "username", "role")
+
+    def __init__(self, id, username, role):
+        self.id       = id
+        self.username = username
+        self.role     = role
 
 
 class Course(db.Model):
@@ -36,22 +65,43 @@ class Course(db.Model):
     name       = db.Column(db.String(120), nullable=False)
     time       = db.Column(db.String(120), nullable=False)          # NEW
     capacity   = db.Column(db.Integer, nullable=False)
+    # seats taken, kept in step with the enrollments table by the routes
+    # (see reserve_seat / release_seat in app.py); `flask reconcile-seats`
+    # repairs any drift
+    enrolled_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    # set while a background job deletes the course with its teacher: it is
+    # out of the catalog and takes no new students
+    closed = db.Column(
+        db.Boolean, nullable=False, default=False, server_default=db.false()
+    )
     teacher_id = db.Column(
         db.Integer,
         db.ForeignKey("users.id", ondelete="CASCADE"),
-        nullable=False
+        nullable=False,
+        index=True
     )
 
     teacher     = db.relationship("User",   back_populates="taught_courses")
     enrollments = db.relationship(
         "Enrollment",
         back_populates="course",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
 
 class Enrollment(db.Model):
     __tablename__ = "enrollments"
+    __table_args__ = (
+        # one row per (student, course); also serves lookups by student_id
+        db.Index(
+            "ix_enrollments_student_course",
+            "student_id", "course_id",
+            unique=True
+        ),
+    )
     id         = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(
         db.Integer,
@@ -61,9 +111,134 @@ class Enrollment(db.Model):
     course_id  = db.Column(
         db.Integer,
         db.ForeignKey("courses.id", ondelete="CASCADE"),
-        nullable=False
+        nullable=False,
+        index=True
     )
     grade      = db.Column(db.Float)
 
     student    = db.relationship("User",   back_populates="enrollments")
     course     = db.relationship("Course", back_populates="enrollments")
+
+
+class WaitlistEntry(db.Model):
+    # one row per student waiting for a seat; FIFO order is the id
+    __tablename__ = "waitlist"
+    __table_args__ = (
+        db.Index(
+            "ix_waitlist_student_course",
+            "student_id", "course_id",
+            unique=True
+        ),
+        # next-in-line lookups and position counts within a course
+        db.Index("ix_waitlist_course_id_id", "course_id", "id"),
+    )
+    id         = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    course_id  = db.Column(
+        db.Integer,
+        db.ForeignKey("courses.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+
+class CourseMeeting(db.Model):
+    # Course.time parsed into one row per weekly meeting (see schedule.py),
+    # so time conflicts are an indexed interval join instead of string work
+    __tablename__ = "course_meetings"
+    __table_args__ = (
+        db.Index("ix_course_meetings_course_day", "course_id", "day"),
+        db.Index(
+            "ix_course_meetings_day_start",
+            "day", "start_min", "end_min"
+        ),
+    )
+    id         = db.Column(db.Integer, primary_key=True)
+    course_id  = db.Column(
+        db.Integer,
+        db.ForeignKey("courses.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    day        = db.Column(db.SmallInteger, nullable=False)   # 0 = Monday
+    start_min  = db.Column(db.SmallInteger, nullable=False)   # minutes after midnight
+    end_min    = db.Column(db.SmallInteger, nullable=False)
+
+
+class CourseGradeStats(db.Model):
+    # running totals over a course's graded enrollments, moved by
+    # gradestats.apply_changes as grades change; mean and variance come
+    # from the sums, so a dashboard reads one row instead of the roster
+    __tablename__ = "course_grade_stats"
+    course_id = db.Column(
+        db.Integer,
+        db.ForeignKey("courses.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    graded    = db.Column(db.Integer, nullable=False, default=0)
+    grade_sum = db.Column(db.Float, nullable=False, default=0.0)
+    grade_sq  = db.Column(db.Float, nullable=False, default=0.0)  # sum of squares
+
+
+class GradeBucket(db.Model):
+    # histogram of a course's grades, one row per gradestats bucket
+    __tablename__ = "course_grade_buckets"
+    course_id = db.Column(
+        db.Integer,
+        db.ForeignKey("courses.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    bucket    = db.Column(db.SmallInteger, primary_key=True)
+    count     = db.Column(db.Integer, nullable=False, default=0)
+
+
+class StudentGradeStats(db.Model):
+    # per-student totals behind the GPA shown on the student dashboard
+    __tablename__ = "student_grade_stats"
+    student_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    graded     = db.Column(db.Integer, nullable=False, default=0)
+    grade_sum  = db.Column(db.Float, nullable=False, default=0.0)
+    points_sum = db.Column(db.Float, nullable=False, default=0.0)  # GPA points
+
+
+class DataVersion(db.Model):
+    # change counters for cached data (see bump_version in app.py); a cache
+    # compares one small number instead of re-reading what it holds
+    __tablename__ = "data_versions"
+    name       = db.Column(db.String(40), primary_key=True)
+    version    = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime)                 # UTC, for Last-Modified
+
+
+class Job(db.Model):
+    # background admin work run by jobs.JobRunner; this table is the queue,
+    # so jobs survive restarts and any worker process can claim them
+    __tablename__ = "jobs"
+    __table_args__ = (
+        db.Index("ix_jobs_status_id", "status", "id"),
+    )
+    id           = db.Column(db.Integer, primary_key=True)
+    kind         = db.Column(db.String(40), nullable=False)
+    status       = db.Column(db.String(10), nullable=False, default="queued")
+    params       = db.Column(db.Text, nullable=False, default="{}")   # JSON
+    checkpoint   = db.Column(db.Text)                                 # JSON
+    result       = db.Column(db.Text)                                 # JSON
+    message      = db.Column(db.String(500))
+    done         = db.Column(db.Integer, nullable=False, default=0)
+    total        = db.Column(db.Integer)
+    attempts     = db.Column(db.Integer, nullable=False, default=0)
+    created_by   = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="SET NULL")
+    )
+    created_at   = db.Column(db.DateTime, server_default=db.func.now())
+    started_at   = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)       # UTC; see JobRunner.stale_after
+    finished_at  = db.Column(db.DateTime)
@@ -0,0 +1,62 @@
+# passwords.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Werkzeug method strings: "scrypt:N:r:p" or "pbkdf2:<digest>:<iterations>"
+DEFAULT_METHOD = "scrypt:32768:8:1"
+# unless configured, KDFs may use every core but one, and at most this many:
+# each scrypt call holds 32 MiB and a whole core for a few hundred ms
+MAX_DEFAULT_WORKERS = 4
+
+_method = DEFAULT_METHOD
+_prefix = None
+_pool = None
+
+
+def default_workers():
+    return min(MAX_DEFAULT_WORKERS, max(1, (os.cpu_count() or 1) - 1))
+
+
+def configure(method=None, workers=None):
+    """Set the KDF parameters and size the hashing pool (0 = no pool)."""
+    global _method, _prefix, _pool
+    _method = method or DEFAULT_METHOD
+    # what a hash made with these settings starts with, e.g. "scrypt" is
+    # stored as "scrypt:32768:8:1"; also rejects a bad method up front
+    _prefix = generate_password_hash("", method=_method).split("$", 1)[0]
+    if _pool is not None:
+        _pool.shutdown(wait=False)
+    if workers == 0:
+        _pool = None
+    else:
+        _pool = ThreadPoolExecutor(max_workers=workers or default_workers(),
+                                   thread_name_prefix="kdf")
+
+
+def current_method():
+    return _method
+
+
+def _run(fn, *args, **kwargs):
+    # scrypt/pbkdf2 release the GIL, so this fixed pool bounds how many
+    # cores password work can take at once; a login burst queues here
+    # while every other route keeps its share of the CPU
+    if _pool is None:
+        return fn(*args, **kwargs)
+    return _pool.submit(fn, *args, **kwargs).result()
+
+
+def hash_password(pw):
+    return _run(generate_password_hash, pw, method=_method)
+
+
+def verify_password(pw_hash, pw):
+    return _run(check_password_hash, pw_hash, pw)
+
+
+def needs_rehash(pw_hash):
+    if _prefix is None:
+        configure(_method, 0)
+    return pw_hash.split("$", 1)[0] != _prefix
@@ -0,0 +1,74 @@
+# perf.py
+import threading
+import time
+from collections import Counter, deque
+
+
+class RequestProfile:
+    """SQL statements issued while serving one request."""
+
+    def __init__(self, method, path, endpoint):
+        self.method = method
+        self.path = path
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.statements = []            # (sql, seconds)
+
+    def record(self, sql, seconds):
+        self.statements.append((sql, seconds))
+
+    def summary(self, status, slowest=5, repeat_threshold=5):
+        # statements are compared as compiled SQL (placeholders, not
+        # values), so a lazy load inside a loop shows up as one statement
+        # repeated N times
+        counts = Counter(sql for sql, _ in self.statements)
+        slow = sorted(self.statements, key=lambda s: s[1], reverse=True)
+        return {
+            "method": self.method,
+            "path": self.path,
+            "endpoint": self.endpoint,
+            "status": status,
+            "total_ms": (time.perf_counter() - self.started) * 1000,
+            "db_ms": sum(s for _, s in self.statements) * 1000,
+            "statements": len(self.statements),
+            "slowest": [
+                {"sql": sql, "ms": s * 1000} for sql, s in slow[:slowest]
+            ],
+            "repeated": [
+                {"sql": sql, "count": n}
+                for sql, n in counts.most_common()
+                if n >= repeat_threshold
+            ],
+        }
+
+
+class ProfileLog:
+    """Ring buffer of the most recent request summaries."""
+
+    def __init__(self, maxlen=200):
+        self._items = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, summary):
+        with self._lock:
+            self._items.append(summary)
+
+    def recent(self):
+        with self._lock:
+            return list(reversed(self._items))
+
+    def by_endpoint(self):
+        totals = {}
+        for s in self.recent():
+            t = totals.setdefault(s["endpoint"], {
+                "endpoint": s["endpoint"], "requests": 0, "statements": 0,
+                "db_ms": 0.0, "total_ms": 0.0, "max_statements": 0,
+                "repeated": 0,
+            })
+            t["requests"] += 1
+            t["statements"] += s["statements"]
+            t["db_ms"] += s["db_ms"]
+            t["total_ms"] += s["total_ms"]
+            t["max_statements"] = max(t["max_statements"], s["statements"])
+            t["repeated"] += bool(s["repeated"])
+        return sorted(totals.values(), key=lambda t: t["db_ms"], reverse=True)
@@ -0,0 +1,135 @@
+# ratelimit.py
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalStore:
+    """In-process counters with expiry, capped at `maxsize` keys.
+
+    When full, the least recently touched counter is dropped, so memory stays
+    bounded even if every request comes from a new address. Each worker
+    process has its own counts; use a shared store when running several.
+    """
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._data = OrderedDict()      # key -> [expires_at, count]
+        self._lock = threading.Lock()
+
+    def incr(self, key, ttl):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                entry = self._data[key] = [now + ttl, 0]
+            entry[1] += 1
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return entry[1]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return 0
+            return entry[1]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize,
+                    "evictions": self.evictions}
+
+
+class RedisStore:
+    """Same interface backed by Redis, shared by every worker process."""
+
+    def __init__(self, client, prefix="ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    def incr(self, key, ttl):
+        pipe = self.client.pipeline()
+        pipe.incr(self.prefix + key)
+        pipe.expire(self.prefix + key, math.ceil(ttl))
+        return pipe.execute()[0]
+
+    def get(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+def make_store(url, maxsize=100_000):
+    if not url or url.startswith("memory://"):
+        return LocalStore(maxsize)
+    if url.startswith(("redis://", "rediss://")):
+        import redis        # only needed for a shared store
+        return RedisStore(redis.Redis.from_url(url))
+    raise ValueError(f"unsupported rate limit store: {url}")
+
+
+class SlidingWindowLimiter:
+    """At most `limit` hits per `window` seconds for each key.
+
+    Uses the sliding-window counter approximation: one counter per fixed
+    window, with the previous window's count weighted by how much of it
+    still overlaps the last `window` seconds. That is two integers per key
+    instead of a timestamp per hit.
+    """
+
+    def __init__(self, store, name, limit, window):
+        self.store = store
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def _keys(self, key, now):
+        # wall clock, so counters line up across processes sharing a store
+        index = int(now // self.window)
+        elapsed = now - index * self.window
+        base = f"{self.name}:{key}:"
+        return base + str(index), base + str(index - 1), elapsed
+
+    def _retry_after(self, current, previous, elapsed):
+        # seconds until the weighted count drops back below the limit
+        if current >= self.limit or not previous:
+            return max(1, math.ceil(self.window - elapsed))
+        wait = (self.window - elapsed
+                - (self.limit - current) * self.window / previous)
+        return max(1, math.ceil(wait))
+
+    def _check(self, current, previous, elapsed):
+        weight = (self.window - elapsed) / self.window
+        if previous * weight + current > self.limit:
+            return self._retry_after(current, previous, elapsed)
+        return 0
+
+    def hit(self, key):
+        """Count one hit; return seconds to wait if over the limit, else 0."""
+        cur_key, prev_key, elapsed = self._keys(key, time.time())
+        current = self.store.incr(cur_key, 2 * self.window)
+        return self._check(current, self.store.get(prev_key), elapsed)
+
+    def peek(self, key):
+        """Like hit() but without counting: would one more hit be refused?"""
+        cur_key, prev_key, elapsed = self._keys(key, time.time())
+        current = self.store.get(cur_key) + 1
+        return self._check(current, self.store.get(prev_key), elapsed)
+
+    def reset(self, key):
+        cur_key, prev_key, _ = self._keys(key, time.time())
+        self.store.delete(cur_key)
+        self.store.delete(prev_key)
@@ -0,0 +1,73 @@
+# schedule.py
+import re
+
+# Course.time is free text such as "MWF 3:00 - 5:00 PM" or
+# "TTh 10:30am-11:45am; F 13:00-14:00". parse_meetings turns it into
+# (day, start_minute, end_minute) tuples, day 0 = Monday.
+
+DAYS = {
+    "monday": 0, "mon": 0, "m": 0,
+    "tuesday": 1, "tues": 1, "tue": 1, "tu": 1, "t": 1,
+    "wednesday": 2, "wed": 2, "w": 2,
+    "thursday": 3, "thurs": 3, "thur": 3, "thu": 3, "th": 3, "r": 3,
+    "friday": 4, "fri": 4, "f": 4,
+    "saturday": 5, "sat": 5, "sa": 5, "s": 5,
+    "sunday": 6, "sun": 6, "su": 6, "u": 6,
+}
+# "Tuesdays 2pm-3pm": plural full names, so the "s" isn't read as Saturday
+DAYS.update({name + "s": day for name, day in list(DAYS.items())
+             if name.endswith("day")})
+DAYS["weds"] = 2
+# longest spellings first so "th" wins over "t" + "h"
+_DAY_RE = re.compile("|".join(sorted(DAYS, key=len, reverse=True)))
+
+_SEGMENT_RE = re.compile(
+    r"""^\s*(?P<days>[a-z][a-z/,.\s]*?)\s*
+        (?P<start>\d{1,2}(?::\d{2})?)\s*(?P<smer>[ap])?\.?m?\.?\s*
+        (?:-|–|to)\s*
+        (?P<end>\d{1,2}(?::\d{2})?)\s*(?P<emer>[ap])?\.?m?\.?\s*$""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+def _days(text):
+    text = re.sub(r"[\s/,.]", "", text.lower())
+    found, pos = [], 0
+    while pos < len(text):
+        m = _DAY_RE.match(text, pos)
+        if not m:
+            return []
+        found.append(DAYS[m.group()])
+        pos = m.end()
+    return sorted(set(found))
+
+
+def _minutes(hm, meridiem):
+    hours, _, mins = hm.partition(":")
+    hours, mins = int(hours), int(mins or 0)
+    if meridiem:
+        hours = hours % 12 + (12 if meridiem.lower() == "p" else 0)
+    return hours * 60 + mins
+
+
+def parse_meetings(text):
+    """Return [(day, start_min, end_min), ...]; [] if `text` is unparseable."""
+    meetings = []
+    for segment in re.split(r"[;\n]", text or ""):
+        if not segment.strip():
+            continue
+        m = _SEGMENT_RE.match(segment)
+        if not m:
+            return []
+        days = _days(m.group("days"))
+        smer, emer = m.group("smer"), m.group("emer")
+        end = _minutes(m.group("end"), emer)
+        # "3:00 - 5:00 PM": the trailing meridiem covers both times unless
+        # that would put the start after the end ("11:00 - 12:15 PM")
+        start = _minutes(m.group("start"), smer or emer)
+        if not smer and emer and start >= end:
+            start = _minutes(m.group("start"), "a")
+        if not days or not 0 <= start < end <= 24 * 60:
+            return []
+        meetings += [(day, start, end) for day in days]
+    return meetings
@@ -0,0 +1,177 @@
+# seatfeed.py
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+class SeatFeed:
+    """Coalesces seat-count changes and fans them out as server-sent events.
+
+    Writers call mark() with the courses whose counters moved once their
+    transaction has committed. One background thread wakes every `interval`
+    seconds, reads the marked courses in a single query and publishes only
+    the counts that actually changed. Every `poll` seconds it re-reads all
+    courses instead, which picks up commits made by other processes.
+
+    Each event is encoded once and kept in a short backlog; subscribers
+    wait on one condition and send the shared bytes, so a publish costs the
+    same whether ten or ten thousand clients are listening.
+    """
+
+    def __init__(self, load_counts, app_context, interval=0.5, poll=5.0,
+                 backlog=256, keepalive=15.0):
+        self._load = load_counts      # (ids or None for all) -> {id: count}
+        self._context = app_context
+        self.interval = interval
+        self.poll = poll
+        self.keepalive = keepalive
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=backlog)     # (seq, encoded event)
+        self._seq = 0
+        self._known = None                       # {course id: count}
+        self._snapshot = None                    # (seq, encoded snapshot)
+        self._dirty = set()
+        self._dirty_all = False
+        self._subscribers = 0
+        self._thread = None
+
+    # writers --------------------------------------------------------------
+    def mark(self, course_ids=None):
+        with self._cond:
+            if not self._subscribers:
+                return
+            if course_ids is None:
+                self._dirty_all = True
+            else:
+                self._dirty.update(course_ids)
+
+    # background thread ----------------------------------------------------
+    def _run(self):
+        next_poll = time.monotonic() + self.poll
+        while True:
+            time.sleep(self.interval)
+            with self._cond:
+                if not self._subscribers:
+                    continue
+                full = self._dirty_all or time.monotonic() >= next_poll
+                ids, self._dirty, self._dirty_all = self._dirty, set(), False
+            if full:
+                next_poll = time.monotonic() + self.poll
+            elif not ids:
+                continue
+            try:
+                with self._context():
+                    counts = self._load(None if full else ids)
+            except Exception:
+                log.exception("seat feed refresh failed")
+                continue
+            self._apply(counts)
+
+    def _apply(self, counts):
+        with self._cond:
+            if self._known is None:
+                return
+            changed = {cid: n for cid, n in counts.items()
+                       if self._known.get(cid) != n}
+            if not changed:
+                return
+            self._known.update(changed)
+            self._seq += 1
+            self._events.append((self._seq, self._encode("seats", changed)))
+            self._cond.notify_all()
+
+    def _encode(self, kind, counts):
+        return (f"id: {self._seq}\nevent: {kind}\n"
+                f"data: {json.dumps(counts, separators=(',', ':'))}\n\n"
+                ).encode()
+
+    def _snapshot_event(self):
+        # caller holds the lock; encoded at most once per sequence number
+        if self._snapshot is None or self._snapshot[0] != self._seq:
+            self._snapshot = (self._seq, self._encode("snapshot", self._known))
+        return self._snapshot[1]
+
+    # subscribers ----------------------------------------------------------
+    def subscribe(self, load_all, last_event_id=None):
+        """Register one client; returns the generator to stream to it.
+
+        Call from the request so `load_all` can use the database; the
+        generator itself never touches it.
+        """
+        with self._cond:
+            if self._known is None:
+                # nothing was tracked while nobody listened, so earlier
+                # event ids can't be resumed from
+                self._known = dict(load_all())
+                self._seq += 1
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="seat-feed", daemon=True
+                )
+                self._thread.start()
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            if last_event_id is not None and \
+                    oldest - 1 <= last_event_id <= self._seq:
+                seq, first = last_event_id, b""        # resume by replaying
+            else:
+                seq, first = self._seq, self._snapshot_event()
+        return _Subscription(self, self._stream(seq, first))
+
+    def _stream(self, seq, first):
+        try:
+            yield b"retry: 3000\n\n" + first
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq > seq,
+                                        timeout=self.keepalive)
+                    pending = []
+                    for s, event in reversed(self._events):
+                        if s <= seq:
+                            break
+                        pending.append(event)
+                    if pending and self._events[0][0] > seq + 1:
+                        # fell further behind than the backlog reaches
+                        pending = [self._snapshot_event()]
+                    else:
+                        pending.reverse()
+                    seq = self._seq
+                yield b"".join(pending) if pending else b": keepalive\n\n"
+        finally:
+            self._unsubscribe()
+
+    def _unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+            if not self._subscribers:
+                self._known = None            # reloaded by the next client
+                self._events.clear()
+
+    def stats(self):
+        with self._cond:
+            return {"subscribers": self._subscribers, "seq": self._seq,
+                    "backlog": len(self._events)}
+
+
+class _Subscription:
+    # WSGI servers close() the body even when a client leaves before it was
+    # iterated, and an unstarted generator skips its finally block then
+    def __init__(self, feed, stream):
+        self._feed = feed
+        self._stream = stream
+        self._started = False
+
+    def __iter__(self):
+        self._started = True
+        return self._stream
+
+    def close(self):
+        if self._started:
+            self._stream.close()
+        else:
+            self._started = True
+            self._feed._unsubscribe()
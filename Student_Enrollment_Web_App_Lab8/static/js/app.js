@@ -0,0 +1,25 @@
+// Live seat counts: cells marked data-seats="<course id>" follow the
+// server-sent events from /api/seats/stream instead of a page refresh.
+(function () {
+  var script = document.currentScript;
+  var url = script && script.dataset.seatStream;
+  if (!url || !window.EventSource) return;
+
+  var cells = {};
+  document.querySelectorAll("[data-seats]").forEach(function (cell) {
+    (cells[cell.dataset.seats] = cells[cell.dataset.seats] || []).push(cell);
+  });
+
+  function apply(event) {
+    var counts = JSON.parse(event.data);
+    Object.keys(counts).forEach(function (id) {
+      (cells[id] || []).forEach(function (cell) {
+        cell.textContent = counts[id] + "/" + cell.dataset.capacity;
+      });
+    });
+  }
+
+  var source = new EventSource(url);
+  source.addEventListener("snapshot", apply);
+  source.addEventListener("seats", apply);
+})();
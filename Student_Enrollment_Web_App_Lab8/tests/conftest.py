@@ -0,0 +1,98 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+# app.py reads DATABASE_URL at import time; default to a scratch SQLite file
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as appmod  # noqa: E402
+import passwords  # noqa: E402
+from models import db, User, Course, Enrollment  # noqa: E402
+
+# cheap hashes, computed inline: tests don't measure the KDF
+passwords.configure("pbkdf2:sha256:1000", workers=0)
+
+CACHES = ("catalog_cache", "catalog_rows_cache", "seated_rows_cache",
+          "seat_cache", "user_cache", "user_count_cache", "report_cache")
+
+
+def clear_caches():
+    for name in CACHES:
+        getattr(appmod, name).clear()
+
+
+def reset_db(flask_app):
+    # data versions restart at zero, so cached pages must go as well
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+    clear_caches()
+
+
+@pytest.fixture
+def app():
+    flask_app = appmod.app
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False,
+                            RATELIMIT_ENABLED=False)
+    appmod.job_runner.workers = 0          # tests drive jobs by hand
+    reset_db(flask_app)
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+
+
+def make_user(username, role):
+    user = User(username=username, role=role, password_hash="x")
+    db.session.add(user)
+    db.session.flush()
+    return user.id
+
+
+def make_course(teacher_id, name="Course", time="MW 10:00-11:00",
+                capacity=30):
+    course = Course(name=name, time=time, capacity=capacity,
+                    teacher_id=teacher_id)
+    db.session.add(course)
+    db.session.flush()
+    appmod.sync_course_meetings(course.id, time)
+    return course.id
+
+
+def enroll(student_id, course_id, grade=None):
+    db.session.add(Enrollment(student_id=student_id, course_id=course_id,
+                              grade=grade))
+    appmod.adjust_seat_count(course_id, +1)
+
+
+def client_for(app, user_id):
+    # a test client already logged in as user_id
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+    return client
+
+
+class StatementCounter:
+    def __init__(self, app):
+        with app.app_context():
+            self.engine = db.engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._count)
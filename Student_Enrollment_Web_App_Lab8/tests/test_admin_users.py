@@ -0,0 +1,48 @@
+import pytest
+
+import app as appmod
+from conftest import client_for, make_user
+from models import db
+
+NAMES = ["alice", "Alice", "al_ice", "al%x", "alz", "ala\U0010ffff", "bob",
+         "\u0101lvaro"]
+
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        admin = make_user("zz_admin", "admin")
+        for name in NAMES:
+            make_user(name, "student")
+        db.session.commit()
+    return client_for(app, admin)
+
+
+def search(app, prefix):
+    with app.app_context():
+        return set(db.session.scalars(
+            db.select(appmod.User.username)
+            .where(appmod.starts_with(appmod.User.username, prefix))
+        ))
+
+
+@pytest.mark.parametrize("prefix", [
+    "al", "al_", "al%", "ala", "A", "\u0101", "z"
+])
+def test_prefix_search_matches_startswith(app, admin, prefix):
+    assert search(app, prefix) == {
+        n for n in NAMES + ["zz_admin"] if n.startswith(prefix)
+    }
+
+
+def test_admin_users_page_filters_by_prefix(app, admin):
+    page = admin.get("/admin/users?q=al_").get_data(as_text=True)
+    assert "al_ice" in page
+    assert "alice" not in page and "alz" not in page
+
+
+def test_next_prefix():
+    assert appmod.next_prefix("ab") == "ac"
+    assert appmod.next_prefix("a\U0010ffff") == "b"
+    assert appmod.next_prefix("\U0010ffff") is None
+    assert appmod.next_prefix("\ud7ff") == "\ue000"   # skips surrogates
@@ -0,0 +1,69 @@
+import pytest
+
+import app as appmod
+from conftest import client_for, enroll, make_course, make_user
+from models import db, Job
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        admin = make_user("admin1", "admin")
+        teacher = make_user("teacher1", "teacher")
+        courses = [make_course(teacher, name=f"Course {i}",
+                               time=f"F {9 + i}:00-{9 + i}:50")
+                   for i in range(3)]
+        for n in range(12):
+            student = make_user(f"student{n}", "student")
+            for i, course in enumerate(courses):
+                enroll(student, course, grade=60 + 3 * n + i)
+        db.session.commit()
+    return client_for(app, admin)
+
+
+def report_jobs(app, *statuses):
+    with app.app_context():
+        return db.session.scalar(
+            db.select(db.func.count(Job.id))
+            .where(Job.kind == "grade_report", Job.status.in_(statuses))
+        )
+
+
+def test_report_builds_in_background_once(app, admin):
+    page = admin.get("/admin/analytics").get_data(as_text=True)
+    assert "being built" in page
+    assert admin.get("/admin/analytics.json").status_code == 503
+    assert admin.get("/admin/analytics/courses.csv").status_code == 503
+    assert report_jobs(app, "queued") == 1          # not one per view
+
+    assert appmod.job_runner.run_next()
+    page = admin.get("/admin/analytics").get_data(as_text=True)
+    assert "36 graded enrollments" in page
+    assert "being built" not in page
+    report = admin.get("/admin/analytics.json").get_json()
+    assert [c["students"] for c in report["courses"]] == [12, 12, 12]
+    csv = admin.get("/admin/analytics/courses.csv").get_data(as_text=True)
+    assert csv.count("\n") == 4
+
+
+def test_stale_report_is_served_while_rebuilding(app, admin):
+    admin.get("/admin/analytics")
+    assert appmod.job_runner.run_next()
+    app.config["ANALYTICS_TTL"] = 0
+    try:
+        page = admin.get("/admin/analytics").get_data(as_text=True)
+        assert "36 graded enrollments" in page
+        assert "A fresher one is being built" in page
+        assert admin.get("/admin/analytics.json").status_code == 200
+        assert report_jobs(app, "queued") == 1
+        assert appmod.job_runner.run_next()
+        # only the newest report is kept
+        with app.app_context():
+            assert db.session.scalar(
+                db.select(db.func.count(Job.id))
+                .where(Job.result.is_not(None))
+            ) == 1
+    finally:
+        app.config["ANALYTICS_TTL"] = 60
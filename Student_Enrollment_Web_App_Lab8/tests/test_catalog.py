@@ -0,0 +1,32 @@
+import app as appmod
+from conftest import client_for, enroll, make_course, make_user
+from models import db
+
+
+def test_seat_changes_reuse_rendered_rows(app):
+    with app.app_context():
+        teacher = make_user("teacher1", "teacher")
+        viewer = make_user("viewer", "student")
+        other = make_user("other", "student")
+        course = make_course(teacher, name="Algebra", capacity=1)
+        db.session.commit()
+    client = client_for(app, viewer)
+    misses = appmod.catalog_rows_cache.stats()["misses"]
+    seated = appmod.seated_rows_cache.stats()["misses"]
+
+    page = client.get("/student").get_data(as_text=True)
+    assert 'data-capacity="1">0/1</td>' in page
+    assert f"/student/enroll/{course}" in page and "Join Waitlist" not in page
+
+    with app.app_context():
+        enroll(other, course)
+        db.session.commit()
+    page = client.get("/student").get_data(as_text=True)
+    assert 'data-capacity="1">1/1</td>' in page
+    assert "Join Waitlist" in page
+    # one render for the catalog version, however often the seats move,
+    # and one seat fill per seat change, shared by every later view
+    client.get("/student")
+    client_for(app, other).get("/student")
+    assert appmod.catalog_rows_cache.stats()["misses"] == misses + 1
+    assert appmod.seated_rows_cache.stats()["misses"] == seated + 2
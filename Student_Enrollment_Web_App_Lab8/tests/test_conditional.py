@@ -0,0 +1,64 @@
+from conftest import client_for, enroll, make_course, make_user
+from app import bump_version
+from models import db, Course, User
+
+
+def seed(app):
+    with app.app_context():
+        teacher = make_user("teacher1", "teacher")
+        student = make_user("student1", "student")
+        course = make_course(teacher, name="Algebra")
+        enroll(student, course)
+        db.session.commit()
+        return student, course
+
+
+def test_dashboard_revalidates(app):
+    student, _ = seed(app)
+    client = client_for(app, student)
+    first = client.get("/student")
+    assert first.headers["ETag"]
+    again = client.get("/student",
+                       headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_pending_flash_skips_304(app):
+    student, _ = seed(app)
+    client = client_for(app, student)
+    etag = client.get("/student").headers["ETag"]
+    with client.session_transaction() as sess:
+        sess["_flashes"] = [("success", "Enrolled in Algebra")]
+    page = client.get("/student", headers={"If-None-Match": etag})
+    assert page.status_code == 200
+    assert "ETag" not in page.headers
+
+
+def test_my_enrollments_etag_follows_catalog(app):
+    student, course = seed(app)
+    client = client_for(app, student)
+    etag = client.get("/api/enrollments").headers["ETag"]
+    with app.app_context():
+        db.session.get(Course, course).name = "Linear Algebra"
+        bump_version("catalog")
+        db.session.commit()
+    page = client.get("/api/enrollments", headers={"If-None-Match": etag})
+    assert page.status_code == 200
+    assert page.get_json()["enrollments"][0]["name"] == "Linear Algebra"
+
+
+def test_form_login_then_revalidate(app):
+    with app.app_context():
+        student = make_user("student1", "student")
+        db.session.get(User, student).set_password("secret1")
+        db.session.commit()
+    client = app.test_client()
+    client.post("/login", data={"username": "student1",
+                                "password": "secret1"})
+    # the welcome message is shown once, then the page is cacheable
+    page = client.get("/student")
+    assert "Welcome, student1" in page.get_data(as_text=True)
+    assert "ETag" not in page.headers
+    etag = client.get("/student").headers["ETag"]
+    again = client.get("/student", headers={"If-None-Match": etag})
+    assert again.status_code == 304
@@ -0,0 +1,101 @@
+import threading
+
+from conftest import client_for, make_course, make_user
+from models import db, Course, Enrollment
+
+
+def test_concurrent_enrolls_never_exceed_capacity(app):
+    capacity, students = 5, 40
+    with app.app_context():
+        teacher = make_user("teacher1", "teacher")
+        course_id = make_course(teacher, capacity=capacity)
+        student_ids = [make_user(f"student{i}", "student")
+                       for i in range(students)]
+        db.session.commit()
+
+    clients = [client_for(app, sid) for sid in student_ids]
+    barrier = threading.Barrier(students)
+    errors = []
+
+    def enroll(client):
+        barrier.wait()
+        try:
+            client.get(f"/student/enroll/{course_id}")
+        except Exception as exc:       # surfaced below, not lost in a thread
+            errors.append(exc)
+
+    threads = [threading.Thread(target=enroll, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    with app.app_context():
+        enrolled = db.session.scalar(
+            db.select(db.func.count(Enrollment.id))
+            .where(Enrollment.course_id == course_id)
+        )
+        counter = db.session.get(Course, course_id).enrolled_count
+    assert enrolled == capacity
+    assert counter == enrolled
+
+
+def test_batch_locks_courses_before_student(app, monkeypatch):
+    import app as app_module
+    with app.app_context():
+        teacher = make_user("teacher1", "teacher")
+        first = make_course(teacher, name="A", time="MW 10:00-11:00")
+        second = make_course(teacher, name="B", time="TR 10:00-11:00")
+        student = make_user("student1", "student")
+        db.session.commit()
+
+    calls = []
+    for name in ("lock_courses", "lock_student"):
+        real = getattr(app_module, name)
+        def wrapper(arg, *rest, _name=name, _real=real):
+            arg = list(arg) if _name == "lock_courses" else arg
+            calls.append((_name, arg))
+            return _real(arg, *rest)
+        monkeypatch.setattr(app_module, name, wrapper)
+
+    resp = client_for(app, student).post("/api/enrollments/batch", json={
+        "operations": [{"op": "enroll", "course_id": second},
+                       {"op": "enroll", "course_id": first}]})
+    assert resp.status_code == 200
+    assert [r["status"] for r in resp.get_json()["results"]] == \
+        ["enrolled", "enrolled"]
+    # every course is locked before the student, none after it
+    assert calls[0][0] == "lock_courses"
+    assert sorted(calls[0][1]) == sorted([first, second])
+    assert calls[1] == ("lock_student", student)
+
+
+def test_batch_deadlock_is_409(app, monkeypatch):
+    import app as app_module
+    from sqlalchemy.exc import OperationalError
+    with app.app_context():
+        teacher = make_user("teacher1", "teacher")
+        held = make_course(teacher, name="A", time="MW 10:00-11:00")
+        wanted = make_course(teacher, name="B", time="TR 10:00-11:00")
+        student = make_user("student1", "student")
+        db.session.add(Enrollment(student_id=student, course_id=held))
+        db.session.get(Course, held).enrolled_count = 1
+        db.session.commit()
+
+    def deadlock(*args):
+        raise OperationalError("UPDATE courses", {},
+                               Exception("deadlock detected"))
+    monkeypatch.setattr(app_module, "reserve_seat", deadlock)
+
+    resp = client_for(app, student).post("/api/enrollments/batch", json={
+        "operations": [{"op": "drop", "course_id": held},
+                       {"op": "enroll", "course_id": wanted}]})
+    assert resp.status_code == 409
+    # the drop that ran before the failure was rolled back with it
+    with app.app_context():
+        assert db.session.scalar(
+            db.select(Enrollment.id).filter_by(student_id=student,
+                                              course_id=held)
+        ) is not None
+        assert db.session.get(Course, held).enrolled_count == 1
@@ -0,0 +1,135 @@
+import pytest
+from sqlalchemy import event
+
+import app as appmod
+import gradestats
+from conftest import client_for, enroll, make_course, make_user
+from models import db, Enrollment
+
+
+@pytest.fixture
+def term(app):
+    # two courses by one teacher, three students graded in both
+    with app.app_context():
+        ids = {"admin": make_user("admin1", "admin"),
+               "teacher": make_user("teacher1", "teacher")}
+        ids["courses"] = [
+            make_course(ids["teacher"], name="Algebra", time="M 9-10"),
+            make_course(ids["teacher"], name="Poetry", time="T 9-10"),
+        ]
+        ids["students"] = [make_user(f"student{i}", "student")
+                           for i in range(3)]
+        for i, sid in enumerate(ids["students"]):
+            for course in ids["courses"]:
+                enroll(sid, course, grade=70 + 10 * i)
+        gradestats.rebuild()
+        db.session.commit()
+    return ids
+
+
+def enrollment_id(app, student_id, course_id):
+    with app.app_context():
+        return db.session.scalar(db.select(Enrollment.id).where(
+            Enrollment.student_id == student_id,
+            Enrollment.course_id == course_id))
+
+
+def assert_consistent(app):
+    with app.app_context():
+        assert gradestats.verify() == []
+
+
+def test_teacher_save(app, term):
+    course, sid = term["courses"][0], term["students"][0]
+    eid = enrollment_id(app, sid, course)
+    client_for(app, term["teacher"]).post(
+        f"/teacher/course/{course}", data={f"grade_{eid}": "95"})
+    with app.app_context():
+        assert db.session.get(Enrollment, eid).grade == 95
+        assert gradestats.student_stats(sid).graded == 2
+    assert_consistent(app)
+
+
+def test_overlapping_teacher_saves(app, term):
+    course, sid = term["courses"][0], term["students"][1]
+    eid = enrollment_id(app, sid, course)          # grade 80
+    client = client_for(app, term["teacher"])
+
+    done = []
+
+    def save_elsewhere(conn, cursor, statement, *args):
+        # a second save commits 80 -> 90 right after this one read the
+        # roster (a nested app context has its own session and connection)
+        if done or "FROM enrollments JOIN users" not in statement:
+            return
+        done.append(True)
+        with app.app_context():
+            db.session.execute(db.update(Enrollment)
+                               .where(Enrollment.id == eid).values(grade=90))
+            gradestats.apply_changes(removed=[(course, sid, 80.0)],
+                                     added=[(course, sid, 90.0)])
+            db.session.commit()
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "after_cursor_execute", save_elsewhere)
+    try:
+        client.post(f"/teacher/course/{course}", data={f"grade_{eid}": "70"})
+    finally:
+        event.remove(engine, "after_cursor_execute", save_elsewhere)
+    assert done
+
+    with app.app_context():
+        assert db.session.get(Enrollment, eid).grade == 90
+    with client.session_transaction() as sess:
+        assert ("warning", "student1: changed by someone else meanwhile, "
+                "not saved.") in sess["_flashes"]
+    assert_consistent(app)
+
+
+def test_student_unenroll(app, term):
+    client_for(app, term["students"][2]).get(
+        f"/student/unenroll/{term['courses'][1]}")
+    assert_consistent(app)
+
+
+def test_batch_drop(app, term):
+    client_for(app, term["students"][0]).post(
+        "/api/enrollments/batch",
+        json={"operations": [{"op": "drop", "course_id": c}
+                             for c in term["courses"]]})
+    assert_consistent(app)
+
+
+def test_admin_deletes_student(app, term):
+    client_for(app, term["admin"]).post(
+        f"/admin/users/{term['students'][1]}/delete")
+    assert_consistent(app)
+
+
+def test_teacher_delete_job(app, term):
+    client_for(app, term["admin"]).post(
+        f"/admin/users/{term['teacher']}/delete")
+    assert appmod.job_runner.run_next()
+    with app.app_context():
+        assert gradestats.student_stats(term["students"][0]) is None
+    assert_consistent(app)
+
+
+def test_admin_edits_enrollment(app, term):
+    sid, course = term["students"][0], term["courses"][0]
+    eid = enrollment_id(app, sid, course)
+    client_for(app, term["admin"]).post(
+        f"/admin/enrollment/edit/?id={eid}",
+        data={"student_id": sid, "course_id": term["courses"][1],
+              "grade": "55"})
+    assert_consistent(app)
+
+
+def test_admin_deletes_course(app, term):
+    client_for(app, term["admin"]).post(
+        "/admin/course/delete/", data={"id": term["courses"][0]})
+    with app.app_context():
+        assert gradestats.course_stats(term["courses"]).keys() == \
+            {term["courses"][1]}
+    assert_consistent(app)
@@ -0,0 +1,64 @@
+import json
+
+import app as appmod
+from conftest import client_for, enroll, make_course, make_user
+from jobs import enqueue
+from models import db, Course, Job, User
+
+
+def test_import_job_keeps_every_error(app, tmp_path):
+    path = tmp_path / "users.csv"
+    lines = ["username,role,password"]
+    lines += [f"user{i},{'student' if i % 2 else 'wizard'},secret{i}"
+              for i in range(40)]
+    path.write_text("\n".join(lines) + "\n")
+    app.config["IMPORT_CHUNK_SIZE"] = 7
+    with app.app_context():
+        admin = make_user("admin1", "admin")
+        db.session.commit()
+        job_id = enqueue("import", {"kind": "users", "path": str(path),
+                                    "fmt": "csv"})
+    assert appmod.job_runner.run_next()
+
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        assert job.status == "done"
+        result = json.loads(job.result)
+    assert (result["imported"], result["failed"]) == (20, 20)
+    assert len(result["errors"]) == 20
+    page = client_for(app, admin).get(f"/admin/jobs/{job_id}")
+    assert page.get_data(as_text=True).count("<tr><td>") == 20
+
+
+def test_teacher_delete_closes_courses_first(app):
+    with app.app_context():
+        admin = make_user("admin1", "admin")
+        teacher = make_user("teacher1", "teacher")
+        student = make_user("student1", "student")
+        course = make_course(teacher, name="Algebra")
+        enroll(student, make_course(teacher, name="Geometry"))
+        db.session.commit()
+
+    client_for(app, admin).post(f"/admin/users/{teacher}/delete")
+    # queued, not yet run: the courses are gone from the catalog and
+    # can't be joined
+    student_client = client_for(app, student)
+    assert "Algebra" not in student_client.get("/student").get_data(
+        as_text=True)
+    assert student_client.get(f"/student/enroll/{course}").status_code == 404
+    with app.app_context():
+        assert not appmod.take_seat(course)
+        db.session.rollback()
+
+    assert appmod.job_runner.run_next()
+    with app.app_context():
+        assert db.session.get(User, teacher) is None
+        assert db.session.scalar(db.select(db.func.count(Course.id))) == 0
+
+
+def test_first_request_starts_job_runner(app, monkeypatch):
+    started = []
+    monkeypatch.setattr(appmod.job_runner, "start",
+                        lambda: started.append(True))
+    app.test_client().get("/login")
+    assert started
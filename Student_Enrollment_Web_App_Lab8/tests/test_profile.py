@@ -0,0 +1,28 @@
+import pytest
+from flask import g
+from sqlalchemy.exc import IntegrityError
+
+from conftest import make_user
+from models import db, User
+from perf import RequestProfile
+
+
+def test_failed_statement_is_not_timed_into_the_next(app):
+    with app.app_context():
+        make_user("taken", "student")
+        db.session.commit()
+    with app.test_request_context("/"):
+        g.sql_profile = profile = RequestProfile("GET", "/", "home")
+        with pytest.raises(IntegrityError):
+            db.session.execute(db.insert(User).values(
+                username="taken", role="student", password_hash="x"))
+        db.session.rollback()
+        db.session.execute(db.select(User.id)).all()
+        db.session.commit()
+        # nothing left behind on the pooled connection either
+        with db.engine.connect() as conn:
+            assert not conn.info.get("profile_start")
+
+    statements = [sql for sql, _ in profile.statements]
+    assert not any(sql.startswith("INSERT") for sql in statements)
+    assert any(sql.startswith("SELECT") for sql in statements)
@@ -0,0 +1,37 @@
+import pytest
+
+from conftest import (
+    StatementCounter, clear_caches, client_for, enroll, make_course,
+    make_user, reset_db
+)
+from models import db
+
+
+def seed_catalog(app, courses):
+    with app.app_context():
+        teacher = make_user("teacher1", "teacher")
+        student = make_user("student1", "student")
+        ids = [make_course(teacher, name=f"Course {i}",
+                           time=f"MW {8 + i % 10}:00-{8 + i % 10}:50")
+               for i in range(courses)]
+        for course_id in ids[:3]:
+            enroll(student, course_id, grade=90)
+        db.session.commit()
+        return teacher, student
+
+
+def statements(app, user_id, path):
+    client = client_for(app, user_id)
+    clear_caches()
+    with StatementCounter(app) as counter:
+        assert client.get(path).status_code == 200
+    return counter.count
+
+
+@pytest.mark.parametrize("path, who", [("/student", 1), ("/teacher", 0)])
+def test_dashboard_statements_do_not_grow_with_catalog(app, path, who):
+    small = statements(app, seed_catalog(app, 5)[who], path)
+    reset_db(app)
+    large = statements(app, seed_catalog(app, 200)[who], path)
+    assert small == large
+    assert large <= 15
@@ -0,0 +1,85 @@
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import app as appmod
+from conftest import make_user
+from models import db, User
+from ratelimit import LocalStore, SlidingWindowLimiter
+
+
+def test_sliding_window_limiter():
+    limiter = SlidingWindowLimiter(LocalStore(), "t", limit=3, window=60)
+    assert [limiter.hit("k") for _ in range(3)] == [0, 0, 0]
+    assert limiter.peek("k") > 0
+    assert 0 < limiter.hit("k") <= 60
+    assert limiter.peek("other") == 0
+    limiter.reset("k")
+    assert limiter.peek("k") == 0
+
+
+@pytest.fixture
+def limited(app, monkeypatch):
+    # fresh counters, 20 failures a minute per address, 5 per username
+    store = LocalStore()
+    monkeypatch.setattr(appmod, "ip_limiter",
+                        SlidingWindowLimiter(store, "login-ip", 20, 60))
+    monkeypatch.setattr(appmod, "username_limiter",
+                        SlidingWindowLimiter(store, "login-user", 5, 300))
+    app.config["RATELIMIT_ENABLED"] = True
+    yield app
+    app.config["RATELIMIT_ENABLED"] = False
+
+
+def add_students(app, n):
+    with app.app_context():
+        for i in range(n):
+            user = db.session.get(User, make_user(f"student{i}", "student"))
+            user.set_password(f"secret{i}")
+        db.session.commit()
+
+
+def login(app, username, password, addr="10.0.0.1", headers=None):
+    return app.test_client().post(
+        "/login", data={"username": username, "password": password},
+        environ_base={"REMOTE_ADDR": addr}, headers=headers)
+
+
+def test_successful_logins_from_one_address_are_not_capped(limited):
+    add_students(limited, 25)
+    codes = [login(limited, f"student{i}", f"secret{i}").status_code
+             for i in range(25)]
+    assert codes == [302] * 25
+
+
+def test_failures_per_address(limited):
+    codes = [login(limited, f"nobody{i}", "wrong-pw").status_code
+             for i in range(21)]
+    assert codes == [200] * 20 + [429]
+    refused = login(limited, "nobody", "wrong-pw")
+    assert 0 < int(refused.headers["Retry-After"]) <= 60
+    # other addresses are unaffected
+    assert login(limited, "nobody", "wrong-pw", addr="10.0.0.2").status_code \
+        == 200
+
+
+def test_failures_per_username(limited):
+    add_students(limited, 1)
+    codes = [login(limited, "student0", "wrong-pw", addr=f"10.0.1.{i}")
+             .status_code for i in range(6)]
+    assert codes == [200] * 5 + [429]
+    # even the right password waits out the lockout
+    assert login(limited, "student0", "secret0", addr="10.0.2.1") \
+        .status_code == 429
+
+
+def test_forwarded_for_behind_trusted_proxy(limited, monkeypatch):
+    monkeypatch.setattr(limited, "wsgi_app", ProxyFix(limited.wsgi_app,
+                                                      x_for=1))
+    for i in range(20):
+        login(limited, f"nobody{i}", "wrong-pw",
+              headers={"X-Forwarded-For": "192.0.2.7"})
+    proxy = "10.0.0.9"
+    assert login(limited, "other", "wrong-pw", addr=proxy,
+                 headers={"X-Forwarded-For": "192.0.2.7"}).status_code == 429
+    assert login(limited, "other", "wrong-pw", addr=proxy,
+                 headers={"X-Forwarded-For": "192.0.2.8"}).status_code == 200
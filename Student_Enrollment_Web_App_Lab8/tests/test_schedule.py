@@ -0,0 +1,80 @@
+import pytest
+
+from app import fill_from_waitlist, release_seat
+from conftest import client_for, enroll, make_course, make_user
+from models import db, Enrollment, WaitlistEntry
+from schedule import parse_meetings
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("MWF 3:00 - 5:00 PM", [(0, 900, 1020), (2, 900, 1020), (4, 900, 1020)]),
+    ("TTh 10:30am-11:45am; F 13:00-14:00",
+     [(1, 630, 705), (3, 630, 705), (4, 780, 840)]),
+    ("Tuesdays 2pm-3pm", [(1, 840, 900)]),
+    ("Mondays, Wednesdays 9-10am", [(0, 540, 600), (2, 540, 600)]),
+    ("Thursdays 11:00 - 12:15 PM", [(3, 660, 735)]),
+    ("Weds 1-2pm", [(2, 780, 840)]),
+    ("Sat 9:00-10:00", [(5, 540, 600)]),
+    ("Su 9-10", [(6, 540, 600)]),
+])
+def test_parse_meetings(text, expected):
+    assert parse_meetings(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "", "TBA", "Online", "M 5pm-3pm", "Mx 9-10", "MW 25:00-26:00",
+])
+def test_parse_meetings_unparseable(text):
+    assert parse_meetings(text) == []
+
+
+@pytest.fixture
+def clash(app):
+    # "held" and "full" overlap; one student holds "held" and waits on "full"
+    with app.app_context():
+        teacher = make_user("teacher1", "teacher")
+        waiting = make_user("waiting", "student")
+        seated = make_user("seated", "student")
+        held = make_course(teacher, name="Held", time="MW 10:00-11:00")
+        full = make_course(teacher, name="Full", time="Mondays 10:30-11:30",
+                           capacity=1)
+        enroll(seated, full)
+        db.session.add(WaitlistEntry(student_id=waiting, course_id=full))
+        db.session.commit()
+        enroll(waiting, held)
+        db.session.commit()
+        return {"waiting": waiting, "seated": seated, "held": held,
+                "full": full}
+
+
+def test_enroll_rejects_clash(app, clash):
+    client = client_for(app, clash["waiting"])
+    client.get(f"/student/enroll/{clash['full']}")
+    with client.session_transaction() as sess:
+        assert sess["_flashes"] == [("warning", "Full overlaps with Held.")]
+    with app.app_context():
+        assert not db.session.scalar(db.select(Enrollment.id).where(
+            Enrollment.student_id == clash["waiting"],
+            Enrollment.course_id == clash["full"]))
+
+
+def test_promotion_skips_clashing_student(app, clash):
+    with app.app_context():
+        other = make_user("other", "student")
+        db.session.add(WaitlistEntry(student_id=other,
+                                     course_id=clash["full"]))
+        db.session.commit()
+        assert release_seat(clash["seated"], clash["full"])
+        assert fill_from_waitlist(clash["full"]) == [other]
+        db.session.commit()
+        # the clashing student keeps their place for later
+        assert db.session.scalars(
+            db.select(WaitlistEntry.student_id)
+        ).all() == [clash["waiting"]]
+
+
+def test_waitlisted_clash_keeps_leave_button(app, clash):
+    client = client_for(app, clash["waiting"])
+    page = client.get("/student").get_data(as_text=True)
+    assert f"/student/waitlist/leave/{clash['full']}" in page
+    assert "Waitlist #1 (time conflict, skipped)" in page